@@ -0,0 +1,147 @@
+import hmac
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, stream_with_context, abort, jsonify
+from werkzeug.exceptions import HTTPException
+
+from models import db, Venue, Artist
+from queries import venues_query, artists_query, shows_query, VENUES_KEY, ARTISTS_KEY, SHOWS_KEY
+from pagination import keyset_page, page_args
+import filters
+from schedule import ShowFilters
+import importer
+
+try:
+    import orjson
+except ImportError:  # fall back to the standard library encoder
+    orjson = None
+
+# JSON API. Rows are serialized straight from the SQL result tuples:
+#   {"fields": [...], "data": [[...], ...], "next_cursor": "..."}
+# ?format=ndjson streams every matching row instead, one JSON array per line
+# after a first line holding the field names.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+NDJSON_BATCH_SIZE = 1000
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _select_fields(stmt, key_columns):
+    """ Narrow stmt to the ?fields= (sparse fieldset) while keeping the
+    pagination key columns. Returns (stmt, names of the requested fields).
+    """
+    columns = stmt.selected_columns
+    requested = request.args.get('fields')
+    if not requested:
+        return stmt, list(columns.keys())
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}")
+    chosen = [columns[name] for name in names]
+    extra = [column for column in key_columns if column.key not in names]
+    return stmt.with_only_columns(*chosen, *extra), names
+
+
+def _respond(stmt, key_columns, fields):
+    session = db.session
+    width = len(fields)
+
+    if request.args.get('format') == 'ndjson':
+        stmt = stmt.order_by(*key_columns).execution_options(yield_per=NDJSON_BATCH_SIZE)
+
+        def generate():
+            yield dumps(fields) + b'\n'
+            for row in session.execute(stmt):
+                yield dumps(tuple(row)[:width]) + b'\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        rows, next_cursor = keyset_page(session, stmt, key_columns, **page_args())
+    except ValueError:
+        abort(400, 'Invalid cursor')
+    body = dumps({
+        'fields': fields,
+        'data': [tuple(row)[:width] for row in rows],
+        'next_cursor': next_cursor
+    })
+    return Response(body, mimetype='application/json')
+
+
+def _entity_filters(model, stmt):
+    city = request.args.get('city')
+    if city:
+        stmt = stmt.where(model.city == city)
+    # ?genre= (repeatable, &match=any) &state= &upcoming=1, as on the listing pages
+    return stmt.where(*filters.conditions(model, filters.Filters.from_args(request.args)))
+
+
+@api.route('/venues')
+def venues():
+    """ ?city= &state= &genre= &fields= &cursor= &per_page= &format=ndjson """
+    stmt, fields = _select_fields(venues_query(), VENUES_KEY)
+    return _respond(_entity_filters(Venue, stmt), VENUES_KEY, fields)
+
+
+@api.route('/artists')
+def artists():
+    """ ?city= &state= &genre= &fields= &cursor= &per_page= &format=ndjson """
+    stmt, fields = _select_fields(artists_query(), ARTISTS_KEY)
+    return _respond(_entity_filters(Artist, stmt), ARTISTS_KEY, fields)
+
+
+@api.route('/shows')
+def shows():
+    """ ?from= &to= (start_time range, to exclusive) &venue= &artist= (ids)
+    &city= &state= &genre= (of the venue) &fields= &cursor= &per_page= &format=ndjson
+    """
+    stmt, fields = _select_fields(shows_query(), SHOWS_KEY)
+    try:
+        show_filters = ShowFilters.from_args(request.args)
+    except ValueError:
+        abort(400, "'from'/'to' must be ISO 8601 dates or datetimes, 'venue'/'artist' ids")
+    venue_filters = filters.Filters.from_args(request.args)
+    stmt = stmt.where(*show_filters.conditions(), *filters.conditions(Venue, venue_filters))
+    return _respond(stmt, SHOWS_KEY, fields)
+
+
+@api.route('/import/<kind>', methods=['POST'])
+def import_rows(kind):
+    """ Bulk import a CSV (text/csv) or NDJSON (application/x-ndjson) request
+    body; ?format= overrides the content type. Responds with the import report.
+    Needs `Authorization: Bearer <IMPORT_API_TOKEN>`; a header, unlike a
+    cookie, is never sent by a cross-site form, so no CSRF token is needed.
+    """
+    token = current_app.config['IMPORT_API_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        abort(401, 'A valid import token is required')
+    if kind not in importer.KINDS:
+        abort(404)
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in ('csv', 'ndjson'):
+        abort(400, "'format' must be csv or ndjson")
+    batch_size = min(request.args.get('batch_size', 1000, type=int), 10000)
+
+    rows = importer.read_rows(importer.text_stream(request.stream), fmt)
+    report = importer.run(db.session, kind, rows, max(batch_size, 1))
+    return jsonify(report.as_dict())
+
+
+@api.errorhandler(HTTPException)
+def http_error(error):
+    return jsonify({'error': error.description}), error.code
@@ -3,61 +3,131 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+from datetime import datetime, timedelta
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, make_response, stream_with_context
+from werkzeug.exceptions import HTTPException
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from flask_migrate import Migrate
 import logging
-from logging import Formatter, FileHandler
+from logging import Formatter, FileHandler, StreamHandler
 from flask_wtf import Form
 from forms import *
-from models import db, Venue, Artist, Show
+import config
+import database
+from routing import read_only
+from models import db, Venue, Artist, Show, VenueSummary, ArtistSummary
+from queries import venue_areas_query, group_venue_areas, shows_query, SHOWS_KEY, ARTISTS_KEY
+from pagination import keyset_page, page_args
+import loading
+import search as search_index
+from search import search, matches, count_label
+from filters import Filters, conditions, facets
+import schedule
+from schedule import ShowFilters
+import show_counts
+import summaries
+from formatting import format_datetime, sql_datetime
+import explain
+import changes
+import conditional
+import deletion
+from api import api
+import assets
+import importer
+import seed
+from metrics import Metrics, logger as metrics_logger
+from cache import ResponseCache, tags_for, cache_tag
+from feed import Feed
+import templating
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
 app = Flask(__name__)
 moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+app.config.from_object(config.profile())
+engine = database.init_app(app, db)
 migrate = Migrate(app,db)
 
+app.register_blueprint(api)
+assets.init_app(app)
+metrics = Metrics(app)
+metrics.collector(database.pool_metrics(engine))
+response_cache = ResponseCache(app)
+# Fragments share the page cache and its tags
+templating.init_app(app, response_cache.backend)
+recent_feed = Feed(app, engine)
+
+changes.track(db.session)
+# Every session leaves deleted venues/artists out
+deletion.hide_deleted()
+
+@changes.subscribe
+def refresh_page_summaries(changeset):
+    # On a connection of its own: the committing session is still finishing up.
+    # Runs before the cache is invalidated so that no page is cached from stale rows.
+    try:
+        with engine.begin() as connection:
+            summaries.refresh_changes(connection, changeset, app.config['SUMMARY_SHOWS'])
+    except Exception:
+        app.logger.exception('Could not refresh the page summaries of %r', changeset)
+
+# Only used where there is no pg_trgm (SQLite): see search.py
+@changes.subscribe
+def update_search_indexes(changeset):
+    try:
+        with engine.connect() as connection:
+            search_index.refresh_changes(connection, changeset)
+    except Exception:
+        app.logger.exception('Could not update the search indexes with %r', changeset)
+
+# Before the cache is invalidated too, so the home page is rendered from the new feed
+@changes.subscribe
+def update_recent_feed(changeset):
+    try:
+        with engine.connect() as connection:
+            recent_feed.apply(connection, changeset)
+    except Exception:
+        app.logger.exception('Could not update the recent feed with %r', changeset)
+
+# Drop the cached pages behind every committed change
+@changes.subscribe
+def invalidate_cached_pages(changeset):
+    response_cache.invalidate(tags_for(changeset))
+
+if app.config.get('RAISE_ON_LAZY_LOAD'):
+    # Fail loudly on any relationship load a route did not plan for
+    loading.raise_on_lazy_loads(db.session)
+
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
+# Views pass datetime objects; they are formatted here, once
 app.jinja_env.filters['datetime'] = format_datetime
 
+if app.config['TEMPLATE_PRECOMPILE']:
+    # Compile every template now rather than on the first requests
+    templating.precompile(app)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
+@response_cache.cached('venues', 'artists', 'shows')
 def index():
-    try:
-        # Assuming that the highest id = newest (could create a timestamp in db and save it on creation)
-        recentlyCreatedVenues = db.session.query(Venue).order_by(Venue.id.desc()).limit(10).all()
-        recentlyCreatedArtists = db.session.query(Artist).order_by(Artist.id.desc()).limit(10).all()
-
-        # Create a list with dictionaries for 10 recent artist names and venue names
-        recentVenues = [{'name': venue.name} for venue in recentlyCreatedVenues]
-        recentArtists = [{'name': artist.name} for artist in recentlyCreatedArtists]
+    # Assuming that the highest id = newest (could create a timestamp in db and save it on creation)
+    # The feed only queries the database the first time and every FEED_TTL seconds (see feed.py)
+    recentVenues = recent_feed.recent(db.session, 'venues')
+    recentArtists = recent_feed.recent(db.session, 'artists')
+    recentShows = recent_feed.recent(db.session, 'shows')
 
-        return render_template('pages/home.html', recentVenues=recentVenues, recentArtists=recentArtists)
-    finally:
-        db.session.close()
+    return render_template('pages/home.html', recentVenues=recentVenues, recentArtists=recentArtists,
+                           recentShows=recentShows)
 
 
 
@@ -65,56 +135,40 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@response_cache.cached('venues')
 def venues():
     
     try:
-      # Query all cities and states (distinc to get unique)
-      cities_and_states = db.session.query(Venue.city, Venue.state).distinct().all()
-      data = []
-
-      for city, state in cities_and_states:
-          venues_in_city = db.session.query(Venue).filter_by(city=city, state=state).all()
-
-          venues_data = []
-
-          for venue in venues_in_city:
-              # Count the number of upcoming shows for the current venue
-              num_upcoming_shows = len([show for show in venue.shows if show.start_time > datetime.now()])
-              venue_data = {
-                  "id": venue.id,
-                  "name": venue.name,
-                  "num_upcoming_shows": num_upcoming_shows
-              }
-              venues_data.append(venue_data)
-
-          city_state_data = {
-              "city": city,
-              "state": state,
-              "venues": venues_data
-          }
-
-          data.append(city_state_data)
-
-      return render_template('pages/venues.html', areas=data)
+      # One grouped query for every venue and its upcoming show count.
+      # Rows come back ordered by area and are grouped lazily while the template renders.
+      filters = Filters.from_args(request.args)
+      rows = db.session.execute(venue_areas_query().where(*conditions(Venue, filters)))
+      sidebar = facets(db.session, Venue, filters, cache=response_cache.backend)
+      return render_template('pages/venues.html', areas=group_venue_areas(rows), facets=sidebar, filters=filters)
     except Exception as e:
        print(e)
        flash("Unable to query venues in database")
        return render_template('pages/venues.html')
-    finally:
-       db.session.remove()
        
 
     
 
 
 @app.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
     try:
        
       search_term = request.form.get('search_term', '')
+      page = request.form.get('page', 1, type=int)
+      per_page = app.config['SEARCH_PAGE_SIZE']
+      filters = Filters.from_args(request.form)
 
-      # use sql LIKE to search
-      search_result = db.session.query(Venue).filter(Venue.name.ilike(f"%{search_term}%")).all()
+      # Ranked, paginated search backed by the trigram indexes
+      total, search_result = search(db.session, Venue, search_term, page, per_page, options=loading.VENUE_SEARCH,
+                                    where=conditions(Venue, filters))
+      sidebar = facets(db.session, Venue, filters, where=[matches(db.session, Venue, search_term)],
+                       key=search_term, cache=response_cache.backend)
 
       # Prepare response dict for each result. 
       venue_data_list = []
@@ -122,54 +176,61 @@ def search_venues():
         venue_data = {
             "id": venue.id,
             "name": venue.name,
-            "num_upcoming_shows": len(venue.shows)
+            "num_upcoming_shows": venue.upcoming_show_count
         }
         venue_data_list.append(venue_data)
 
       response = {
-        "count": len(venue_data_list),
-        "data": venue_data_list
+        "count": count_label(total),
+        "data": venue_data_list,
+        "page": page,
+        "has_next": page * per_page < total
       }
 
-      return render_template('pages/search_venues.html', results=response, search_term=search_term)
+      return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                             facets=sidebar, filters=filters)
     except Exception as e:
        print(e)
-    finally:
-       db.session.remove()
 
 
 @app.route('/venues/<int:venue_id>')
+@response_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
     try:
-        venue = db.session.query(Venue).get_or_404(venue_id)
-
-        past_shows = []
-        upcoming_shows = []
-
-        for show in venue.shows:
-            temp_show = {
-                'artist_id': show.artist_id,
-                'artist_name': show.artist.name,
-                'artist_image_link': show.artist.image_link,
-                'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-            }
-            if show.start_time <= datetime.now():
-                past_shows.append(temp_show)
-            else:
-                upcoming_shows.append(temp_show)
+        # Answer revalidations with a 304 before loading shows or rendering
+        version = conditional.venue_version(db.session, venue_id)
+        if version is None:
+            abort(404)
+        not_modified = conditional.not_modified(version)
+        if not_modified:
+            return not_modified
+
+        # The venue and its precomputed show lists in one row
+        row = db.session.execute(
+            select(Venue, VenueSummary)
+            .outerjoin(VenueSummary, VenueSummary.venue_id == Venue.id)
+            .where(Venue.id == venue_id)
+            .options(*loading.VENUE_DETAIL)
+        ).first()
+        if row is None:
+            abort(404)
+        venue, summary = row
+
+        # The show lists and their counts, from the same summary row
+        shows = summaries.page_shows(db.session, Venue, venue_id, summary, app.config['SUMMARY_SHOWS'])
+        for show in shows['upcoming_shows'] + shows['past_shows']:
+            cache_tag(f'artist:{show["artist_id"]}')
 
         data = vars(venue)
-        data['past_shows'] = past_shows
-        data['upcoming_shows'] = upcoming_shows
-        data['past_shows_count'] = len(past_shows)
-        data['upcoming_shows_count'] = len(upcoming_shows)
+        data.update(shows)
 
-        return render_template('pages/show_venue.html', venue=data)
+        response = make_response(render_template('pages/show_venue.html', venue=data))
+        return conditional.stamp(response, version)
+    except HTTPException:
+        raise
     except Exception as e:
         flash("An error occurred while processing your request.")
         return render_template('pages/venues.html')
-    finally:
-       db.session.remove()
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -206,8 +267,6 @@ def create_venue_submission():
             db.session.rollback()
             flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
             print(e)
-        finally:
-            db.session.remove()
 
         return redirect(url_for('index'))
     else:
@@ -218,85 +277,115 @@ def create_venue_submission():
 
   
 # Frontend will send a DELETE request using async/await (promise)
-@app.route('/venues/<int:venue_id>', methods=['DELETE'])
-def delete_venue(venue_id):
-  
-  try:
-     venue = db.session.query(Venue).get(venue_id)
-
-     if not venue:
-        flash(f"Venue with ID: {venue_id} not found")
-        return jsonify({'message': 'Venue not found'}), 404
+# The venue/artist is hidden right away; its rows are purged afterwards (see deletion.py)
+def delete_entity(model, entity_id, status_endpoint):
+  kind = model.__name__
+  name = db.session.scalar(select(model.name).where(model.id == entity_id))
+  if name is None:
+     flash(f"{kind} with ID: {entity_id} not found")
+     return jsonify({'message': f'{kind} not found'}), 404
 
-     db.session.delete(venue)
+  try:
+     deletion.mark_deleted(db.session, model, entity_id)
      db.session.commit()
-     flash(f"Deleted: {venue.name}")
-     return jsonify({'message': 'Venue deleted successfully'}), 204
   except Exception as e:
      db.session.rollback()
-     flash(f"Couldn't delete: {venue.name}")
+     flash(f"Couldn't delete: {name}")
      print(e)
      return jsonify({'message': 'An error occurred'}), 500
-  finally:
-     db.session.remove()
+
+  if not app.config['DELETE_RETENTION_DAYS']:
+     deletion.schedule_purge(app, model, entity_id)
+  flash(f"Deleted: {name}")
+  status_url = url_for(status_endpoint, **{f'{kind.lower()}_id': entity_id})
+  return jsonify({'message': f'{kind} deleted', 'status_url': status_url}), 202, {'Location': status_url}
+
+
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  return delete_entity(Venue, venue_id, 'venue_deletion_status')
+
+
+@app.route('/venues/<int:venue_id>/deletion')
+def venue_deletion_status(venue_id):
+  return jsonify(deletion.status(db.session, Venue, venue_id, app.config['DELETE_RETENTION_DAYS']))
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached('artists')
 def artists():
   try:
-     data = db.session.query(Artist).all()
-     return render_template('pages/artists.html', artists=data)
-  finally:
-     db.session.remove()
+     # One page of (id, name) rows, seeking past the cursor on (name, id)
+     filters = Filters.from_args(request.args)
+     stmt = select(Artist.id, Artist.name).where(*conditions(Artist, filters))
+     data, next_cursor = keyset_page(db.session, stmt, ARTISTS_KEY, **page_args())
+     sidebar = facets(db.session, Artist, filters, cache=response_cache.backend)
+     return render_template('pages/artists.html', artists=data, next_cursor=next_cursor, facets=sidebar, filters=filters)
+  except ValueError:
+     abort(400)
 
   
 
 
 @app.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
-  try:
-    search_term = request.form.get('search_term','')
+  search_term = request.form.get('search_term','')
+  page = request.form.get('page', 1, type=int)
+  per_page = app.config['SEARCH_PAGE_SIZE']
+  filters = Filters.from_args(request.form)
     
-    #use sql LIKE to search
-    search_result = db.session.query(Artist).filter(Artist.name.ilike(f"%{search_term}%")).all()
+  # Ranked, paginated search backed by the trigram indexes
+  total, search_result = search(db.session, Artist, search_term, page, per_page, options=loading.ARTIST_SEARCH,
+                                where=conditions(Artist, filters))
+  sidebar = facets(db.session, Artist, filters, where=[matches(db.session, Artist, search_term)],
+                   key=search_term, cache=response_cache.backend)
     
-    # Prepare response dict for each result.
-    response ={
-      "count": len(search_result),
-      "data":[{
-          "id": artist.id,
-          "name": artist.name,
-          "num_upcoming_shows": len(artist.shows)
-      } for artist in search_result]
-    }
-
-    return render_template('pages/search_artists.html', results=response, search_term=search_term)
-  finally:
-     db.session.remove()
+  # Prepare response dict for each result.
+  response ={
+    "count": count_label(total),
+    "page": page,
+    "has_next": page * per_page < total,
+    "data":[{
+        "id": artist.id,
+        "name": artist.name,
+        "num_upcoming_shows": artist.upcoming_show_count
+    } for artist in search_result]
+  }
+
+  return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                         facets=sidebar, filters=filters)
 
 
 @app.route('/artists/<int:artist_id>')
+@response_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
     try:
-        artist = db.session.query(Artist).get_or_404(artist_id)
-
-        past_shows = []
-        upcoming_shows = []
-
-        for show in artist.shows:
-            venue = show.venue
-            show_data = {
-                "venue_id": venue.id,
-                "venue_name": venue.name,
-                "venue_image_link": venue.image_link,
-                "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-            }
-            if show.start_time < datetime.now():
-                past_shows.append(show_data)
-            else:
-                upcoming_shows.append(show_data)
+        # Answer revalidations with a 304 before loading shows or rendering
+        version = conditional.artist_version(db.session, artist_id)
+        if version is None:
+            abort(404)
+        not_modified = conditional.not_modified(version)
+        if not_modified:
+            return not_modified
+
+        # The artist and its precomputed show lists in one row
+        row = db.session.execute(
+            select(Artist, ArtistSummary)
+            .outerjoin(ArtistSummary, ArtistSummary.artist_id == Artist.id)
+            .where(Artist.id == artist_id)
+            .options(*loading.ARTIST_DETAIL)
+        ).first()
+        if row is None:
+            abort(404)
+        artist, summary = row
+
+        # The show lists and their counts, from the same summary row
+        shows = summaries.page_shows(db.session, Artist, artist_id, summary, app.config['SUMMARY_SHOWS'])
+        for show in shows['upcoming_shows'] + shows['past_shows']:
+            cache_tag(f'venue:{show["venue_id"]}')
 
         data = {
             "id": artist.id,
@@ -310,50 +399,67 @@ def show_artist(artist_id):
             "seeking_venue": artist.seeking_venue,
             "seeking_description": artist.seeking_description,
             "image_link": artist.image_link,
-            "past_shows": past_shows,
-            "upcoming_shows": upcoming_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows_count": len(upcoming_shows)
+            **shows
         }
 
-        return render_template('pages/show_artist.html', artist=data)
+        response = make_response(render_template('pages/show_artist.html', artist=data))
+        return conditional.stamp(response, version)
+    except HTTPException:
+        raise
     except Exception as e:
         flash("An error occurred while processing your request.")
         return render_template('pages/artists.html')
-    finally:
-        db.session.remove()
+
+
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  return delete_entity(Artist, artist_id, 'artist_deletion_status')
+
+
+@app.route('/artists/<int:artist_id>/deletion')
+def artist_deletion_status(artist_id):
+  return jsonify(deletion.status(db.session, Artist, artist_id, app.config['DELETE_RETENTION_DAYS']))
 
 
 #  Update
 #  ----------------------------------------------------------------
+def invalid_choices(form):
+  # Genres and state go through the form's choices before they reach the model,
+  # which would only reject them at flush time
+  return [f"{field.name}: {', '.join(field.errors)}" for field in (form.genres, form.state)
+          if not field.validate(form)]
+
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-    try:
-      artist = db.session.query(Artist).get(artist_id)
+    artist = db.session.get(Artist, artist_id, options=loading.ARTIST_FORM)
 
-      # If artist found put it in the form for the user to easily edit
-      if artist:
-          form = ArtistForm(obj=artist)
+    # If artist found put it in the form for the user to easily edit
+    if artist:
+        form = ArtistForm(obj=artist)
 
-      return render_template('forms/edit_artist.html', form=form, artist=artist)
-    finally:
-       db.session.remove()
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   
   try:
-    artist = db.session.query(Artist).get(artist_id)
+    artist = db.session.get(Artist, artist_id, options=loading.ARTIST_FORM)
 
     if not artist:
       flash('Artist not found.')
       return redirect(url_for('show_artist', artist_id=artist_id))
 
+    form = ArtistForm(request.form, meta={'csrf': False})
+    errors = invalid_choices(form)
+    if errors:
+      flash('Please fix the following errors: ' + '; '.join(errors))
+      return render_template('forms/edit_artist.html', form=form, artist=artist), 400
+
     artist.name = request.form.get('name')
     artist.city = request.form.get('city')
-    artist.state = request.form.get('state')
+    artist.state = form.state.data
     artist.phone = request.form.get('phone')
-    artist.genres = request.form.getlist('genres')
+    artist.genres = form.genres.data
     artist.image_link = request.form.get('image_link')
     artist.facebook_link = request.form.get('facebook_link')
     artist.website = request.form.get('website')
@@ -366,39 +472,40 @@ def edit_artist_submission(artist_id):
     db.session.rollback()
     flash('An error occurred. Artist could not be changed.')
     print(e)
-  finally: 
-    db.session.remove()
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-   try:
-    venue = db.session.query(Venue).get(venue_id)
-    form = VenueForm(obj=venue)
+   venue = db.session.get(Venue, venue_id, options=loading.VENUE_FORM)
+   form = VenueForm(obj=venue)
 
-    return render_template('forms/edit_venue.html', form=form, venue=venue)
-   finally:
-      db.session.remove()
+   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
 
   try:
-     venue = db.session.query(Venue).get(venue_id)
+     venue = db.session.get(Venue, venue_id, options=loading.VENUE_FORM)
 
      if not venue:
         flash("Venue not found!")
         return redirect(url_for('show_venue', venue_id=venue_id))
+
+     form = VenueForm(request.form, meta={'csrf': False})
+     errors = invalid_choices(form)
+     if errors:
+        flash('Please fix the following errors: ' + '; '.join(errors))
+        return render_template('forms/edit_venue.html', form=form, venue=venue), 400
      
     # Update attributes
      venue.name = request.form.get('name')
      venue.city = request.form.get('city')
-     venue.state = request.form.get('state')
+     venue.state = form.state.data
      venue.address = request.form.get('address')
      venue.phone = request.form.get('phone')
-     venue.genres = request.form.getlist('genres')
+     venue.genres = form.genres.data
      venue.facebook_link = request.form.get('facebook_link')
      venue.image_link = request.form.get('image_link')
      venue.website_link = request.form.get('website_link')
@@ -411,8 +518,6 @@ def edit_venue_submission(venue_id):
      db.session.rollback()
      flash("An error occured. Venue could not be changed!")
      print(e)
-  finally:
-     db.session.remove()
 
   return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -451,8 +556,6 @@ def create_artist_submission():
             db.session.rollback()
             flash('An error occurred. Artist ' + form.name.data + ' could not be created.')
             print(e)
-        finally:
-            db.session.close()
 
         return redirect(url_for('index'))
     else:
@@ -469,17 +572,18 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@response_cache.cached('shows')
 def shows():
   try:
-    # Use join query to get shows
-    shows = db.session.query(
-      Show.venue_id,
-      Venue.name.label('venue_name'),
-      Show.artist_id,
-      Artist.name.label('artist_name'),
-      Artist.image_link.label('artist_image_link'),
-      Show.start_time
-    ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).all()
+    # ?from= &to= &venue= &artist= &city=, a start_time range on ix_show_start_time
+    show_filters = ShowFilters.from_args(request.args)
+    stmt = shows_query().where(*show_filters.conditions())
+    if app.config['SQL_DATETIME_FORMAT'] and db.engine.dialect.name == 'postgresql':
+      # Let Postgres format the times instead of the template filter, row by row
+      stmt = stmt.add_columns(sql_datetime(Show.start_time, 'full').label('start_time_text'))
+
+    # Use join query to get one page of shows, seeking past the cursor on (start_time, id)
+    shows, next_cursor = keyset_page(db.session, stmt, SHOWS_KEY, **page_args())
 
     # Create a list to store the show data
     data = []
@@ -490,13 +594,58 @@ def shows():
           "artist_id": show.artist_id,
           "artist_name": show.artist_name,
           "artist_image_link": show.artist_image_link,
-          "start_time": show.start_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+          "start_time": show.start_time,
+          "start_time_text": show._mapping.get('start_time_text')
       }
       data.append(show_data)
 
-    return render_template('pages/shows.html', shows=data)
-  finally:
-     db.session.remove()
+    return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, show_filters=show_filters)
+  except ValueError:
+    abort(400)
+
+@app.route('/shows/calendar')
+@response_cache.cached('shows')
+def shows_calendar():
+  # ?month=YYYY-MM (this month by default) and the filters of /shows
+  try:
+    month = request.args.get('month')
+    first = schedule.parse_month(month) if month else datetime.now().date().replace(day=1)
+    show_filters = ShowFilters.from_args(request.args)
+  except ValueError:
+    abort(400)
+
+  # The shows per day, counted by the database in one query
+  weeks = schedule.month_calendar(db.session, first, show_filters)
+  previous_month = (first - timedelta(days=1)).replace(day=1)
+  return render_template('pages/calendar.html', weeks=weeks, month=first, show_filters=show_filters,
+                         previous_month=previous_month, next_month=schedule.next_month(first))
+
+def shows_ics(model, entity_id, version):
+  # Streamed event by event; calendar clients that poll get a 304 when nothing changed
+  if version is None:
+    abort(404)
+  not_modified = conditional.not_modified(version)
+  if not_modified:
+    return not_modified
+  try:
+    show_filters = ShowFilters.from_args(request.args)
+  except ValueError:
+    abort(400)
+  show_filters = ShowFilters(show_filters.start, show_filters.end, **{f'{model.__name__.lower()}_id': entity_id})
+  name = db.session.scalar(select(model.name).where(model.id == entity_id))
+  rows = db.session.execute(schedule.ics_query(show_filters))
+  body = stream_with_context(schedule.ics(rows, f'{name} | Fyyur', request.host_url))
+  response = Response(body, mimetype='text/calendar')
+  response.headers['Content-Disposition'] = f'inline; filename="{model.__name__.lower()}-{entity_id}.ics"'
+  return conditional.stamp(response, version)
+
+@app.route('/venues/<int:venue_id>/shows.ics')
+def venue_shows_ics(venue_id):
+  return shows_ics(Venue, venue_id, conditional.venue_version(db.session, venue_id))
+
+@app.route('/artists/<int:artist_id>/shows.ics')
+def artist_shows_ics(artist_id):
+  return shows_ics(Artist, artist_id, conditional.artist_version(db.session, artist_id))
 
 @app.route('/shows/create')
 def create_shows():
@@ -523,8 +672,6 @@ def create_show_submission():
             db.session.rollback()
             flash('An error occurred. Show could not be listed.')
             print(e)
-        finally:
-            db.session.close()
 
         return redirect(url_for('index'))
     else:
@@ -544,14 +691,115 @@ def server_error(error):
 
 
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
+    log_handler = FileHandler(app.config['ERROR_LOG']) if app.config['ERROR_LOG'] else StreamHandler()
+    log_handler.setFormatter(
         Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
     )
     app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    log_handler.setLevel(logging.INFO)
+    app.logger.addHandler(log_handler)
     app.logger.info('errors')
+    metrics_logger.addHandler(log_handler)
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('refresh-show-counts')
+@click.option('--window', default=60, show_default=True,
+              help='Only refresh venues/artists with a show that started in the last WINDOW minutes. 0 refreshes everything.')
+def refresh_show_counts_command(window):
+    """ Move shows that have started from the upcoming to the past counts.
+    Schedule it (e.g. cron) at least every WINDOW minutes.
+    """
+    updated = show_counts.refresh(db.session, timedelta(minutes=window) if window else None)
+    click.echo(f"Refreshed show counts of {updated} venues/artists")
+
+
+@app.cli.command('explain')
+@click.option('--analyze/--no-analyze', default=True, show_default=True,
+              help='Run the statements (EXPLAIN ANALYZE) instead of only planning them.')
+def explain_command(analyze):
+    """ Print the Postgres plans of the hot-path queries. Run it before and after
+    `flask db upgrade` to compare plans; everything is rolled back afterwards.
+    """
+    try:
+        for name, stmt in explain.hot_path_queries(db.session).items():
+            click.echo(f"== {name}")
+            click.echo(explain.explain(db.session, stmt, analyze))
+            click.echo()
+    finally:
+        db.session.rollback()
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(importer.KINDS)))
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format. Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT batch and commit.')
+def import_command(kind, path, fmt, batch_size):
+    """ Bulk import venues, artists or shows from a CSV or NDJSON file ('-' for stdin).
+    Rows with an id update the existing row.
+    """
+    fmt = fmt or ('csv' if path.endswith('.csv') else 'ndjson')
+    stream = click.get_text_stream('stdin') if path == '-' else open(path, encoding='utf-8', newline='')
+    with stream:
+        report = importer.run(db.session, kind, importer.read_rows(stream, fmt), batch_size)
+
+    for line, message in report.errors:
+        click.echo(f"line {line}: {message}", err=True)
+    click.echo(f"Read {report.read} rows, wrote {report.written}, rejected {report.failed} "
+               f"in {report.elapsed:.2f}s ({report.rows_per_second:.0f} rows/s)")
+
+
+@app.cli.command('seed')
+@click.option('--venues', default=100, show_default=True)
+@click.option('--artists', default=200, show_default=True)
+@click.option('--shows', default=1000, show_default=True)
+@click.option('--seed', 'random_seed', default=0, show_default=True, help='Same seed, same data.')
+def seed_command(venues, artists, shows, random_seed):
+    """ Fill the database with synthetic venues, artists and shows for load tests. """
+    written = seed.seed(db.session, venues, artists, shows, random_seed)
+    click.echo(f"Inserted {written['venues']} venues, {written['artists']} artists and {written['shows']} shows")
+
+
+@app.cli.command('refresh-summaries')
+@click.option('--all', 'everything', is_flag=True, help='Rebuild every summary, not only the stale ones.')
+def refresh_summaries_command(everything):
+    """ Refresh the venue/artist page summaries that are missing or whose next
+    show has started. Schedule it (e.g. cron) every few minutes, and run it with
+    --all after `flask db upgrade` creates the summary tables.
+    """
+    with engine.begin() as connection:
+        written = sum(summaries.refresh_due(connection, model, app.config['SUMMARY_SHOWS'], everything)
+                      for model in (Venue, Artist))
+    click.echo(f"Refreshed {written} page summaries")
+
+
+@app.cli.command('purge-deleted')
+@click.option('--older-than', type=int, help='Days since deletion. Defaults to DELETE_RETENTION_DAYS.')
+def purge_deleted_command(older_than):
+    """ Purge the venues and artists (and their shows) deleted more than
+    DELETE_RETENTION_DAYS ago. Schedule it (e.g. cron) daily.
+    """
+    days = app.config['DELETE_RETENTION_DAYS'] if older_than is None else older_than
+    batch_size = app.config['DELETE_BATCH_SIZE']
+    purged = {model.__name__: deletion.purge_due(db.session, model, timedelta(days=days), batch_size)
+              for model in (Venue, Artist)}
+    click.echo(f"Purged {purged['Venue']} venues and {purged['Artist']} artists")
+
+
+@app.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Delete the files of previous builds.')
+def build_assets_command(clean):
+    """ Bundle, minify, fingerprint and precompress the CSS/JS into static/dist.
+    Run it on deploy, before starting the app with ASSET_BUNDLES on.
+    """
+    manifest = assets.build(app.static_folder, clean=clean, static_url=app.static_url_path)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {hashed}")
+
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -0,0 +1,213 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+
+# Static asset bundles. `flask build-assets` concatenates and minifies the
+# files of each bundle into static/dist under a content-hashed name (e.g.
+# css/site.3f2a9c1b0d4e.css), next to gzip (and, with the `brotli` package,
+# brotli) versions of it, and writes static/dist/manifest.json.
+#
+# With ASSET_BUNDLES on, templates link the hashed files, served from /assets
+# with a one year immutable Cache-Control: a changed file gets a new name, so
+# browsers never need to revalidate. The precompressed version the browser
+# accepts is sent as is; nothing is compressed per request. Without a build
+# (or with ASSET_BUNDLES off, the development default) the source files are
+# linked from /static one by one.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+MAX_AGE = 365 * 24 * 60 * 60
+
+# Bundle name -> source files, relative to the static folder, in load order
+BUNDLES = {
+    'css/site.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded in <head>, before the page renders
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # Deferred, after jQuery
+    'js/site.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+assets = Blueprint('assets', __name__, url_prefix='/assets')
+
+
+def _rebase_urls(css, source, static_url):
+    # url()s are relative to the source file; the bundle is served from /assets,
+    # so point them at the file under the static URL instead
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', 'data:', '#')) or '://' in url:
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return f'url({quote}{static_url.rstrip("/")}/{target}{quote})'
+    return CSS_URL.sub(rebase, css)
+
+
+def minify_css(css):
+    """ Drop comments (except /*! licenses) and the whitespace CSS does not need. """
+    css = re.sub(r'/\*(?!!).*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """ Minify with rjsmin when it is installed (most sources already are minified). """
+    try:
+        import rjsmin
+    except ImportError:
+        return js
+    return rjsmin.jsmin(js)
+
+
+def bundle(static_folder, name, sources, static_url='/static'):
+    """ The concatenated and minified contents of a bundle, as bytes. """
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            parts.append(minify_css(_rebase_urls(text, source, static_url)))
+        else:
+            parts.append(minify_js(text).strip())
+    # A JS file may end without a semicolon
+    return (';\n' if name.endswith('.js') else '\n').join(parts).encode('utf-8')
+
+
+def _hashed_name(name, content):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def compressed(content):
+    """ {suffix: compressed content} for every available encoding. """
+    # mtime=0: the same input gives the same .gz, byte for byte
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+def build(static_folder, bundles=BUNDLES, clean=False, static_url='/static'):
+    """ Build every bundle into static/dist and write the manifest. Files of
+    older builds are kept (pages cached elsewhere may still link them) unless
+    clean is set. static_url is the app's static_url_path, which the url()s of
+    CSS bundles are made absolute against. Returns the manifest.
+    """
+    dist = os.path.join(static_folder, DIST)
+    manifest = {}
+    for name, sources in bundles.items():
+        content = bundle(static_folder, name, sources, static_url)
+        hashed = _hashed_name(name, content)
+        path = os.path.join(dist, hashed)
+        _write(path, content)
+        for suffix, variant in compressed(content).items():
+            _write(path + suffix, variant)
+        manifest[name] = hashed
+
+    if clean:
+        keep = {os.path.join(dist, hashed) + suffix
+                for hashed in manifest.values() for suffix in ('', '.gz', '.br')}
+        for root, dirs, files in os.walk(dist):
+            for file in files:
+                path = os.path.join(root, file)
+                if file != MANIFEST and path not in keep:
+                    os.remove(path)
+
+    # Written last and swapped in, so a running app never reads half a manifest
+    tmp = os.path.join(dist, MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(dist, MANIFEST))
+    return manifest
+
+
+def load_manifest(static_folder):
+    """ The manifest of the last build, or None when nothing was built. """
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def asset_url(filename):
+    """ url_for('static', filename=...) that links the built file of a bundle. """
+    hashed = current_app.extensions['assets'].get(filename)
+    if hashed:
+        return url_for('assets.built', filename=hashed)
+    return url_for('static', filename=filename)
+
+
+def asset_urls(name):
+    """ URLs to link for a bundle: the built file, or else each of its sources. """
+    if name in current_app.extensions['assets']:
+        return [asset_url(name)]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+@assets.route('/<path:filename>')
+def built(filename):
+    directory = os.path.join(current_app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding, suffix = None, ''
+    for name, extension in ENCODINGS:
+        if request.accept_encodings[name] and os.path.isfile(os.path.join(directory, filename + extension)):
+            encoding, suffix = name, extension
+            break
+
+    response = send_from_directory(directory, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """ Load the manifest (when ASSET_BUNDLES is on), serve /assets and add
+    asset_url() and asset_urls() to the templates.
+    """
+    manifest = {}
+    if app.config['ASSET_BUNDLES']:
+        manifest = load_manifest(app.static_folder)
+        if manifest is None:
+            app.logger.warning('ASSET_BUNDLES is on but no assets were built; run `flask build-assets`')
+            manifest = {}
+    app.extensions['assets'] = manifest
+    app.register_blueprint(assets)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
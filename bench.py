@@ -0,0 +1,210 @@
+import json
+import math
+import re
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import click
+from sqlalchemy import select
+
+# Load test and benchmark of every read route of the app, through the Flask
+# test client (no network, one thread) or over real HTTP against a running
+# server (concurrent). Results are written as JSON named after the git commit
+# so that two commits can be compared with --compare.
+#
+#   flask seed --venues 1000 --artists 2000 --shows 20000
+#   python bench.py client --requests 200
+#   python bench.py http --url http://localhost:5000 --concurrency 8 --compare bench-<old>.json
+
+STATEMENTS = re.compile(r'db;[^,]*desc="(\d+) queries"')
+SEARCH_TERMS = ('the', 'hall', 'new york', 'ca')
+
+
+def targets(app, session):
+    """ (name, method, path, form data) for every route the benchmark drives.
+    Routes with an id are requested for the venue/artist with the most shows;
+    routes that change data are left out.
+    """
+    from models import Venue, Artist
+
+    ids = {
+        'venue_id': session.scalar(select(Venue.id).order_by(
+            (Venue.upcoming_show_count + Venue.past_show_count).desc(), Venue.id).limit(1)),
+        'artist_id': session.scalar(select(Artist.id).order_by(
+            (Artist.upcoming_show_count + Artist.past_show_count).desc(), Artist.id).limit(1)),
+    }
+    result = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint in ('static', 'metrics') or 'import' in rule.endpoint:
+            continue
+        if not rule.arguments <= ids.keys() or any(ids[arg] is None for arg in rule.arguments):
+            continue
+        path = rule.build({arg: ids[arg] for arg in rule.arguments}, append_unknown=False)[1]
+        if 'GET' in rule.methods:
+            result.append((rule.endpoint, 'GET', path, None))
+        elif 'POST' in rule.methods and rule.endpoint.startswith('search_'):
+            for term in SEARCH_TERMS:
+                result.append((f'{rule.endpoint}[{term}]', 'POST', path, {'search_term': term}))
+    return result
+
+
+def percentile(sorted_values, p):
+    """ Nearest-rank percentile of a sorted list. """
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """ samples: list of (seconds, status, statements or None, cache hit). """
+    latencies = sorted(seconds for seconds, status, statements, hit in samples)
+    statements = [statements for seconds, status, statements, hit in samples if statements is not None]
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for seconds, status, statements, hit in samples if status >= 400),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'statements': round(sum(statements) / len(statements), 2) if statements else None,
+        'cache_hit_ratio': round(sum(1 for *rest, hit in samples if hit) / len(samples), 3) if samples else None,
+    }
+
+
+def _statements(server_timing):
+    match = STATEMENTS.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def run_client(app, targets, requests, warmup):
+    """ Drive the targets one after the other through the Flask test client. """
+    client = app.test_client()
+    results = {}
+    for name, method, path, data in targets:
+        for _ in range(warmup):
+            client.open(path, method=method, data=data)
+        samples = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            response.get_data()
+            samples.append((time.perf_counter() - start, response.status_code,
+                            _statements(response.headers.get('Server-Timing')),
+                            response.headers.get('X-Cache') == 'HIT'))
+        results[name] = summarize(samples, time.perf_counter() - started)
+    return results
+
+
+def _fetch(url, method, data):
+    body = urllib.parse.urlencode(data).encode() if data else None
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, body, method=method)) as response:
+            response.read()
+            status, headers = response.status, response.headers
+    except urllib.error.HTTPError as e:
+        status, headers = e.code, e.headers
+    return (time.perf_counter() - start, status,
+            _statements(headers.get('Server-Timing')), headers.get('X-Cache') == 'HIT')
+
+
+def run_http(base_url, targets, requests, warmup, concurrency):
+    """ Drive each target with `concurrency` parallel connections to a running server. """
+    results = {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        for name, method, path, data in targets:
+            url = base_url.rstrip('/') + path
+            list(pool.map(lambda _: _fetch(url, method, data), range(warmup)))
+            started = time.perf_counter()
+            samples = list(pool.map(lambda _: _fetch(url, method, data), range(requests)))
+            results[name] = summarize(samples, time.perf_counter() - started)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(baseline, current):
+    """ Lines comparing p95 latency and statements per route with a baseline run. """
+    lines = [f"{'route':40} {'p95 ms':>20} {'statements':>16}"]
+    for name, stats in current['routes'].items():
+        old = baseline['routes'].get(name)
+        if old is None:
+            continue
+        p95 = f"{old['p95_ms']} -> {stats['p95_ms']}"
+        if old['p95_ms'] and stats['p95_ms']:
+            p95 += f" ({(stats['p95_ms'] - old['p95_ms']) / old['p95_ms']:+.0%})"
+        lines.append(f"{name:40} {p95:>20} {str(old['statements']) + ' -> ' + str(stats['statements']):>16}")
+    return lines
+
+
+@click.command()
+@click.argument('mode', type=click.Choice(['client', 'http']))
+@click.option('--url', default='http://localhost:5000', show_default=True, help='Server to drive in http mode.')
+@click.option('--requests', default=100, show_default=True, help='Measured requests per route.')
+@click.option('--warmup', default=5, show_default=True, help='Unmeasured requests per route first.')
+@click.option('--concurrency', default=4, show_default=True, help='Parallel connections in http mode.')
+@click.option('--route', 'routes', multiple=True, help='Only the routes whose name starts with this (repeatable).')
+@click.option('--no-cache', is_flag=True, help='Disable the rendered page cache (client mode).')
+@click.option('--output', type=click.Path(dir_okay=False), help='Results file. Defaults to bench-<commit>-<mode>.json.')
+@click.option('--compare', 'baseline', type=click.File(), help='Results of an earlier run to compare with.')
+def main(mode, url, requests, warmup, concurrency, routes, no_cache, output, baseline):
+    """ Benchmark every read route: p50/p95/p99 latency, throughput and SQL
+    statements per request (from the Server-Timing header).
+    """
+    from app import app, db, response_cache
+    from cache import NullCache
+
+    baseline = json.load(baseline) if baseline else None
+
+    with app.app_context():
+        selected = [target for target in targets(app, db.session)
+                    if not routes or target[0].startswith(routes)]
+        db.session.remove()
+
+    if mode == 'client':
+        if no_cache:
+            response_cache.backend = NullCache()
+        results = run_client(app, selected, requests, warmup)
+    else:
+        results = run_http(url, selected, requests, warmup, concurrency)
+
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'mode': mode,
+        'requests': requests,
+        'concurrency': concurrency if mode == 'http' else 1,
+        'cache': not no_cache if mode == 'client' else None,
+        'routes': results,
+    }
+    output = output or f"bench-{report['commit']}-{mode}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    click.echo(f"{'route':40} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'stmts':>6} {'errors':>6}")
+    for name, stats in results.items():
+        click.echo(f"{name:40} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} "
+                   f"{stats['throughput_rps']:>8} {str(stats['statements']):>6} {stats['errors']:>6}")
+    click.echo(f"Wrote {output}")
+
+    if baseline:
+        click.echo()
+        for line in compare(baseline, report):
+            click.echo(line)
+
+
+if __name__ == '__main__':
+    main()
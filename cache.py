@@ -0,0 +1,212 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session, g, Response
+from flask.globals import request_ctx
+
+from routing import recently_wrote
+
+
+class NullCache:
+    """ Caching disabled. """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags=(), ttl=None):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache:
+    """ In-process cache bounded by number of entries, with a TTL per entry.
+    Entries can be tagged and dropped by tag. Each worker process has its own.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value, tags = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags=(), ttl=None):
+        expires = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, value, frozenset(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """ Cache shared by every worker and host, stored in Redis. Tags are Redis
+    sets holding the keys tagged with them. Needs the `redis` package.
+    """
+
+    def __init__(self, url, ttl=60, prefix='fyyur:cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, tags=(), ttl=None):
+        ttl = ttl or self.ttl
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.delete(self.prefix + key.decode())
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def create_backend(config):
+    """ Cache backend for CACHE_TYPE: 'memory', 'redis' or 'null'. """
+    cache_type = config.get('CACHE_TYPE', 'memory')
+    ttl = config.get('CACHE_TTL', 60)
+    if cache_type == 'memory':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+    if cache_type == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], ttl)
+    if cache_type == 'null':
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_TYPE: {cache_type}")
+
+
+def tags_for(changes):
+    """ Cache tags made stale by a changes.ChangeSet. """
+    tags = set()
+    tags.update(f'venue:{id}' for id in changes.venues | changes.show_venues)
+    tags.update(f'artist:{id}' for id in changes.artists | changes.show_artists)
+    if changes.venues or changes.show_venues:
+        tags.add('venues')
+    if changes.artists:
+        tags.add('artists')
+    if changes.shows or changes.venues or changes.artists:
+        tags.add('shows')
+    return tags
+
+
+def flashed():
+    """ Whether the current request has flashed messages: still in the session,
+    or already popped by get_flashed_messages() while the template rendered
+    (Flask then keeps them on the request context).
+    """
+    return bool(session.get('_flashes') or request_ctx.flashes)
+
+
+def cache_tag(*tags):
+    """ Add tags to the response being cached, from inside a view. """
+    g.setdefault('cache_tags', set()).update(tags)
+
+
+class ResponseCache:
+    """ Caches whole GET responses keyed by endpoint, view arguments and query
+    string. Views declare tags (statically or with cache_tag()) and entries are
+    invalidated by tag when a commit changes the data behind them.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config)
+        app.extensions['response_cache'] = self
+
+    def invalidate(self, tags):
+        self.backend.invalidate(tags)
+
+    def cached(self, *tags):
+        """ View decorator. Tags may contain `{view_arg}` placeholders. """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages that show flashed messages are personal; never share them.
+                # A user who just wrote must not get a page rendered from a lagging replica.
+                if request.method != 'GET' or session.get('_flashes') or recently_wrote():
+                    return view(**kwargs)
+
+                key = f"{request.endpoint}:{sorted(kwargs.items())}:{request.query_string.decode()}"
+                entry = self.backend.get(key)
+                if entry is not None:
+                    body, status, headers = entry
+                    response = Response(body, status, headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    # Honour If-None-Match/If-Modified-Since against the cached validators
+                    return response.make_conditional(request)
+
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code == 200 and not response.is_streamed and not flashed():
+                    entry_tags = {tag.format(**kwargs) for tag in tags} | g.pop('cache_tags', set())
+                    headers = [(k, v) for k, v in response.headers if k.lower() != 'set-cookie']
+                    self.backend.set(key, (response.get_data(), response.status_code, headers), entry_tags)
+                    response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,91 @@
+from sqlalchemy import event, inspect
+
+from models import Venue, Artist, Show
+
+# Collects which Venue/Artist/Show rows a session changed and hands them to the
+# subscribers once the transaction has committed (never on rollback).
+
+_subscribers = []
+
+
+class ChangeSet:
+    def __init__(self):
+        # Rows changed directly
+        self.venues = set()
+        self.artists = set()
+        self.shows = set()
+        # Venues/artists whose shows were added, moved or removed
+        self.show_venues = set()
+        self.show_artists = set()
+
+    def __bool__(self):
+        return any((self.venues, self.artists, self.shows, self.show_venues, self.show_artists))
+
+    def __repr__(self):
+        return (f'<ChangeSet venues={self.venues} artists={self.artists} shows={self.shows} '
+                f'show_venues={self.show_venues} show_artists={self.show_artists}>')
+
+
+def subscribe(callback):
+    """ Call callback(changeset) after every commit that changed something. """
+    _subscribers.append(callback)
+    return callback
+
+
+def pending(session):
+    """ The ChangeSet of the session's current transaction. """
+    return session.info.setdefault('changes', ChangeSet())
+
+
+def mark(session, venues=(), artists=(), shows=(), show_venues=(), show_artists=()):
+    """ Record changes made with Core statements (bulk UPDATE/DELETE, COPY...)
+    that the ORM does not see.
+    """
+    changes = pending(session)
+    changes.venues.update(venues)
+    changes.artists.update(artists)
+    changes.shows.update(shows)
+    changes.show_venues.update(show_venues)
+    changes.show_artists.update(show_artists)
+
+
+def _record(changes, obj):
+    if isinstance(obj, Venue):
+        changes.venues.add(obj.id)
+    elif isinstance(obj, Artist):
+        changes.artists.add(obj.id)
+    elif isinstance(obj, Show):
+        changes.shows.add(obj.id)
+        attrs = inspect(obj).attrs
+        # Both the current and, for a moved show, the previous venue/artist
+        changes.show_venues.update(v for v in attrs.venue_id.history.sum() if v is not None)
+        changes.show_artists.update(a for a in attrs.artist_id.history.sum() if a is not None)
+        changes.show_venues.add(obj.venue_id)
+        changes.show_artists.add(obj.artist_id)
+
+
+def track(session):
+    """ Install the change tracking listeners on a session (class, sessionmaker
+    or scoped_session).
+    """
+    @event.listens_for(session, 'after_flush')
+    def _after_flush(session, flush_context):
+        changes = pending(session)
+        for obj in session.new:
+            _record(changes, obj)
+        for obj in session.dirty:
+            if session.is_modified(obj, include_collections=False):
+                _record(changes, obj)
+        for obj in session.deleted:
+            _record(changes, obj)
+
+    @event.listens_for(session, 'after_commit')
+    def _after_commit(session):
+        changes = session.info.pop('changes', None)
+        if changes:
+            for callback in _subscribers:
+                callback(changes)
+
+    @event.listens_for(session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('changes', None)
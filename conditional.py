@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime
+
+from flask import request, Response
+from sqlalchemy import select
+from werkzeug.http import is_resource_modified
+
+import summaries
+from models import Venue, Artist, VenueSummary, ArtistSummary
+
+# ETags of the venue/artist detail pages (and their .ics feeds), read from one
+# row so that a 304 can be answered before anything else is loaded:
+# - the venue/artist's updated_at, bumped by its own edits and by the show
+#   triggers whenever its shows are added, moved or deleted (and by
+#   refresh-show-counts when one of them starts);
+# - its summary row's refreshed_at, which moves with the other side's names
+#   and images;
+# - how many of the summary's upcoming shows have started, which the page
+#   moves to the past list.
+# A page built from the shows on the fly (no summary row yet, or one whose
+# listed upcoming shows have all started) gets no ETag. There is no
+# Last-Modified: started shows change a page without any new timestamp, so
+# If-Modified-Since alone would be answered with stale 304s.
+
+
+def _version(session, kind, model, summary, key, entity_id):
+    row = session.execute(
+        select(model.updated_at, summary.refreshed_at, summary.upcoming_shows, summary.upcoming_show_count)
+        .outerjoin(summary, key == model.id)
+        .where(model.id == entity_id)
+    ).first()
+    if row is None:
+        return None
+    updated_at, refreshed_at, upcoming_shows, upcoming_show_count = row
+    now = datetime.now()
+    if refreshed_at is None or summaries.outrun(upcoming_shows, upcoming_show_count, now):
+        return ''
+    started = summaries.started(upcoming_shows, now)
+    return hashlib.sha1(repr((kind, updated_at, refreshed_at, started)).encode()).hexdigest()
+
+
+def venue_version(session, venue_id):
+    """ ETag of a venue page ('' if it cannot be validated), or None if there
+    is no such venue.
+    """
+    return _version(session, 'venue', Venue, VenueSummary, VenueSummary.venue_id, venue_id)
+
+
+def artist_version(session, artist_id):
+    """ ETag of an artist page ('' if it cannot be validated), or None if there
+    is no such artist.
+    """
+    return _version(session, 'artist', Artist, ArtistSummary, ArtistSummary.artist_id, artist_id)
+
+
+def not_modified(etag):
+    """ A 304 response if the request's If-None-Match matches etag, otherwise None. """
+    if not etag or is_resource_modified(request.environ, etag=etag):
+        return None
+    return stamp(Response(status=304), etag)
+
+
+def stamp(response, etag):
+    """ Set the ETag on a full response. """
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,80 @@
+from sqlalchemy import event
+
+from metrics import gauge
+from routing import replica_binds
+
+# Engine and pool settings. One engine (and pool) per worker process:
+# at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections each, so size Postgres'
+# max_connections (or PgBouncer's pool) for workers x that.
+
+
+def engine_options(config):
+    """ SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings. """
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    if not config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        return options
+
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+    )
+    timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    # PgBouncer rejects startup options; the timeout is set per transaction instead
+    if timeout and not config['PGBOUNCER']:
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout}'}
+    return options
+
+
+def init_app(app, db):
+    """ Initialise db for app with the pool settings and the read replicas;
+    returns the primary engine.
+    """
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    app.config['SQLALCHEMY_BINDS'] = {
+        **replica_binds(app.config['REPLICA_URLS']),
+        **app.config.get('SQLALCHEMY_BINDS', {})
+    }
+    db.init_app(app)
+    with app.app_context():
+        engines = db.engines
+
+    timeout = app.config['DB_STATEMENT_TIMEOUT_MS']
+    if app.config['PGBOUNCER'] and timeout:
+        for engine in engines.values():
+            if engine.dialect.name == 'postgresql':
+                # SET LOCAL only lasts for the transaction, so nothing leaks into the
+                # server connection once PgBouncer hands it to another client
+                event.listen(engine, 'begin', _statement_timeout(timeout))
+
+    return engines[None]
+
+
+def _statement_timeout(timeout):
+    def set_local(conn):
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+    return set_local
+
+
+def pool_metrics(engine):
+    """ A metrics collector for the engine's connection pool. """
+    def collect():
+        pool = engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return []
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        return (
+            gauge('fyyur_db_pool_size', 'Connections kept open by the pool.', pool.size())
+            + gauge('fyyur_db_pool_checked_out', 'Connections in use.', pool.checkedout())
+            + gauge('fyyur_db_pool_checked_in', 'Idle connections in the pool.', pool.checkedin())
+            + gauge('fyyur_db_pool_overflow', 'Connections open beyond the pool size.', max(pool.overflow(), 0))
+            + gauge('fyyur_db_pool_saturation', 'Connections in use over the most the pool allows.',
+                    round(pool.checkedout() / capacity, 3) if capacity > 0 else 0)
+        )
+    return collect
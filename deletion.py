@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, update, delete, func
+from sqlalchemy.orm import Session, with_loader_criteria
+
+import changes
+from models import db, Venue, Artist, Show
+
+# Deleting venues and artists.
+# A DELETE request only marks the row (deleted_at, one UPDATE) and is answered
+# with 202 right away; from then on every ORM query leaves the row out (see
+# hide_deleted). The row and its shows are then purged with set-based DELETEs,
+# DELETE_BATCH_SIZE shows per transaction so that no lock is held for long:
+# - DELETE_RETENTION_DAYS = 0: right away, in a background thread;
+# - otherwise (soft delete): by `flask purge-deleted` once they are that old.
+# `flask purge-deleted` also picks up purges a restarted worker left unfinished.
+
+# model -> (show column pointing at it, show column of the other side,
+#           ChangeSet field of the model, ChangeSet field of the other side)
+SIDES = {
+    Venue: (Show.venue_id, Show.artist_id, 'venues', 'show_artists'),
+    Artist: (Show.artist_id, Show.venue_id, 'artists', 'show_venues'),
+}
+
+# One purge at a time per worker: they compete for the same locks anyway
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge')
+
+
+def hide_deleted(session=Session):
+    """ Leave deleted venues and artists out of every ORM SELECT (joins
+    included) made by session, unless it is executed with
+    execution_options(include_deleted=True). Every session by default.
+    """
+    @event.listens_for(session, 'do_orm_execute')
+    def _hide(orm_execute_state):
+        if (orm_execute_state.is_select
+                and not orm_execute_state.is_column_load
+                and not orm_execute_state.is_relationship_load
+                and not orm_execute_state.execution_options.get('include_deleted')):
+            orm_execute_state.statement = orm_execute_state.statement.options(
+                with_loader_criteria(Venue, Venue.deleted_at.is_(None), include_aliases=True),
+                with_loader_criteria(Artist, Artist.deleted_at.is_(None), include_aliases=True)
+            )
+
+
+def _others(session, model, id):
+    show_key, other_key = SIDES[model][:2]
+    return set(session.scalars(select(other_key).where(show_key == id).distinct()))
+
+
+def mark_deleted(session, model, id):
+    """ Mark a venue (or artist) deleted. Returns False if there is no such
+    row, or it is already marked. The caller commits.
+    """
+    own, other = SIDES[model][2:]
+    result = session.execute(
+        update(model)
+        .where(model.id == id, model.deleted_at.is_(None))
+        .values(deleted_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return False
+    # Its page, and the pages listing its shows, change now
+    changes.mark(session, **{own: [id], other: _others(session, model, id)})
+    return True
+
+
+def purge(session, model, id, batch_size=1000):
+    """ Delete a marked venue (or artist) and its shows, committing every
+    batch_size shows. Returns the number of shows deleted.
+    """
+    show_key = SIDES[model][0]
+    own, other = SIDES[model][2:]
+    others = _others(session, model, id)
+    deleted = 0
+    while True:
+        batch = select(Show.id).where(show_key == id).limit(batch_size).scalar_subquery()
+        result = session.execute(delete(Show).where(Show.id.in_(batch)).execution_options(synchronize_session=False))
+        session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            break
+
+    session.execute(
+        delete(model)
+        .where(model.id == id, model.deleted_at.is_not(None))
+        .execution_options(synchronize_session=False)
+    )
+    # The other side's show counts dropped with the shows
+    changes.mark(session, **{own: [id], other: others})
+    session.commit()
+    return deleted
+
+
+def purge_due(session, model, older_than, batch_size=1000, now=None):
+    """ Purge the venues (or artists) marked deleted more than older_than
+    (a timedelta) ago. Returns how many were purged.
+    """
+    cutoff = (now or datetime.utcnow()) - older_than
+    ids = session.scalars(
+        select(model.id).where(model.deleted_at <= cutoff).execution_options(include_deleted=True)
+    ).all()
+    for id in ids:
+        purge(session, model, id, batch_size)
+    return len(ids)
+
+
+def schedule_purge(app, model, id):
+    """ Purge a marked venue (or artist) in the background. """
+    def run():
+        with app.app_context():
+            try:
+                purge(db.session, model, id, app.config['DELETE_BATCH_SIZE'])
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Could not purge %s %s', model.__name__, id)
+    return _executor.submit(run)
+
+
+def status(session, model, id, retention_days=0):
+    """ Where the deletion of a venue (or artist) stands: 'active' (not
+    deleted), 'purging', 'scheduled' (kept for retention_days) or 'deleted'
+    (no such row any more).
+    """
+    row = session.execute(
+        select(model.deleted_at).where(model.id == id).execution_options(include_deleted=True)
+    ).first()
+    if row is None:
+        return {'status': 'deleted'}
+    if row.deleted_at is None:
+        return {'status': 'active'}
+    show_key = SIDES[model][0]
+    purge_after = row.deleted_at + timedelta(days=retention_days)
+    return {
+        'status': 'scheduled' if purge_after > datetime.utcnow() else 'purging',
+        'deleted_at': row.deleted_at.isoformat(),
+        'purge_after': purge_after.isoformat(),
+        'shows_left': session.scalar(select(func.count(Show.id)).where(show_key == id)),
+    }
@@ -0,0 +1,36 @@
+from sqlalchemy import select, delete, func, text
+
+from datetime import datetime
+
+from models import Venue, Artist, VenueSummary, ArtistSummary
+from queries import venue_areas_query, shows_query, SHOWS_KEY
+import summaries
+
+
+def hot_path_queries(session):
+    """ The statements behind the hot routes, bound to real ids from the database. """
+    venue = session.execute(select(Venue.id, Venue.city, Venue.state).order_by(Venue.id.desc()).limit(1)).first()
+    artist_id = session.scalar(select(func.max(Artist.id)))
+
+    queries = {
+        'venues listing': venue_areas_query(),
+        'shows first page': shows_query().order_by(*SHOWS_KEY).limit(50),
+        'artist detail': select(Artist, ArtistSummary).outerjoin(ArtistSummary).where(Artist.id == artist_id),
+        'artist summary refresh': summaries.shows_statement(Artist, [artist_id], 10, datetime.now()),
+    }
+    if venue:
+        queries.update({
+            'venues in area': select(Venue.id, Venue.name).where(Venue.city == venue.city, Venue.state == venue.state),
+            'venue detail': select(Venue, VenueSummary).outerjoin(VenueSummary).where(Venue.id == venue.id),
+            'venue summary refresh': summaries.shows_statement(Venue, [venue.id], 10, datetime.now()),
+            # Shows the cost of the ON DELETE CASCADE trigger; rolled back by the caller
+            'delete venue': delete(Venue).where(Venue.id == venue.id),
+        })
+    return queries
+
+
+def explain(session, stmt, analyze=True):
+    """ Postgres query plan of stmt, as text. ANALYZE really runs the statement. """
+    sql = stmt.compile(dialect=session.get_bind().dialect, compile_kwargs={'literal_binds': True})
+    options = '(ANALYZE, BUFFERS) ' if analyze else ''
+    return '\n'.join(row[0] for row in session.execute(text(f"EXPLAIN {options}{sql}")))
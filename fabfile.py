@@ -7,7 +7,7 @@ from fabric.contrib.console import confirm
 def test():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest tests", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -39,9 +39,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest tests")
 
 
 def deploy():
@@ -56,3 +54,9 @@ def deploy():
 
 def rollback():
     local("heroku rollback")
+
+# benchmark
+
+
+def bench(mode="client", requests=100):
+    local("python bench.py {} --requests {}".format(mode, requests))
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import Venue, Artist, Show
+
+# The home page's "recently added" feed: the latest FEED_SIZE venues, artists
+# and shows, kept in a bounded ring per kind so that the page renders without
+# a query. Each ring is loaded from the database on first use and kept current
+# by a changes subscriber: new rows are pushed onto it, and a ring whose
+# entries were edited or deleted is reloaded. Given an engine, init_app loads
+# the rings up front (in the gunicorn master with preload_app, so that every
+# worker starts with them).
+#
+# FEED_TYPE 'memory' keeps the rings in the worker process. A worker's
+# subscriber only hears of its own writes, so each ring is also reloaded once
+# it is FEED_TTL seconds old: what another worker added shows up within that
+# time. 'redis' shares the rings between every worker and host.
+
+KINDS = {
+    'venues': (Venue, select(Venue.id, Venue.name).where(Venue.deleted_at.is_(None))),
+    'artists': (Artist, select(Artist.id, Artist.name).where(Artist.deleted_at.is_(None))),
+    'shows': (Show, (
+        select(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link')
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+        .where(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+    )),
+}
+
+
+class MemoryRing:
+    """ Rings held in the worker process, reloaded once they are ttl seconds
+    old (0: never).
+    """
+
+    def __init__(self, size, ttl=0):
+        self.size = size
+        self.ttl = ttl
+        self._rings = {}  # kind -> (expires, deque of entries, newest first)
+        self._lock = threading.Lock()
+
+    def get(self, kind):
+        """ Entries of kind, newest first, or None if it was never loaded or
+        has expired.
+        """
+        with self._lock:
+            expires, ring = self._rings.get(kind, (None, None))
+            if ring is None or expires < time.monotonic():
+                return None
+            return list(ring)
+
+    def push(self, kind, entries):
+        """ Add entries (oldest first) on top of the ring, if it is loaded. """
+        with self._lock:
+            expires, ring = self._rings.get(kind, (None, None))
+            if ring is not None:
+                ring.extendleft(entries)
+
+    def replace(self, kind, entries):
+        expires = time.monotonic() + self.ttl if self.ttl else float('inf')
+        with self._lock:
+            self._rings[kind] = (expires, deque(entries, maxlen=self.size))
+
+
+class RedisRing:
+    """ Rings shared by every worker and host, stored as Redis lists. Needs the
+    `redis` package.
+    """
+
+    def __init__(self, url, size, prefix='fyyur:feed:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.size = size
+        self.prefix = prefix
+
+    def get(self, kind):
+        pipe = self.client.pipeline()
+        pipe.exists(self.prefix + 'loaded:' + kind)
+        pipe.lrange(self.prefix + kind, 0, self.size - 1)
+        loaded, entries = pipe.execute()
+        return [json.loads(entry) for entry in entries] if loaded else None
+
+    def push(self, kind, entries):
+        if not entries or not self.client.exists(self.prefix + 'loaded:' + kind):
+            return
+        pipe = self.client.pipeline()
+        pipe.lpush(self.prefix + kind, *(json.dumps(entry) for entry in entries))
+        pipe.ltrim(self.prefix + kind, 0, self.size - 1)
+        pipe.execute()
+
+    def replace(self, kind, entries):
+        pipe = self.client.pipeline()
+        pipe.delete(self.prefix + kind)
+        if entries:
+            pipe.rpush(self.prefix + kind, *(json.dumps(entry) for entry in entries))
+        pipe.set(self.prefix + 'loaded:' + kind, 1)
+        pipe.execute()
+
+
+def create_ring(config):
+    """ Ring backend for FEED_TYPE: 'memory' or 'redis'. """
+    feed_type = config.get('FEED_TYPE', 'memory')
+    size = config.get('FEED_SIZE', 10)
+    if feed_type == 'memory':
+        return MemoryRing(size, config.get('FEED_TTL', 30))
+    if feed_type == 'redis':
+        return RedisRing(config['FEED_REDIS_URL'], size)
+    raise ValueError(f"Unknown FEED_TYPE: {feed_type}")
+
+
+def _entries(connection, stmt):
+    # JSON-ready: show times as ISO strings (the `datetime` filter takes them)
+    entries = []
+    for row in connection.execute(stmt):
+        entry = dict(row._mapping)
+        if 'start_time' in entry:
+            entry['start_time'] = entry['start_time'].isoformat()
+        entries.append(entry)
+    return entries
+
+
+def _stale(kind, ring, changes):
+    # Ring entries that the change edited or deleted
+    if kind == 'venues':
+        return any(entry['id'] in changes.venues for entry in ring)
+    if kind == 'artists':
+        return any(entry['id'] in changes.artists for entry in ring)
+    return any(entry['id'] in changes.shows or entry['venue_id'] in changes.venues
+               or entry['artist_id'] in changes.artists for entry in ring)
+
+
+class Feed:
+    """ The recently added venues, artists and shows. """
+
+    def __init__(self, app=None, engine=None):
+        self.ring = MemoryRing(10)
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine=None):
+        self.ring = create_ring(app.config)
+        app.extensions['feed'] = self
+        if engine is not None:
+            try:
+                self.prime(engine)
+            except SQLAlchemyError:
+                # e.g. the tables are not created yet: loaded when first read
+                app.logger.warning('Could not load the recent feed', exc_info=True)
+
+    def prime(self, engine):
+        """ Load every ring that is not loaded yet. """
+        with engine.connect() as connection:
+            for kind in KINDS:
+                if self.ring.get(kind) is None:
+                    self.load(connection, kind)
+
+    def load(self, connection, kind):
+        """ (Re)load the ring of kind from the database. connection may be a
+        Connection or a Session.
+        """
+        model, stmt = KINDS[kind]
+        entries = _entries(connection, stmt.order_by(model.id.desc()).limit(self.ring.size))
+        self.ring.replace(kind, entries)
+        return entries
+
+    def recent(self, connection, kind):
+        """ Entries of kind, newest first; loaded with connection the first time. """
+        entries = self.ring.get(kind)
+        if entries is None:
+            entries = self.load(connection, kind)
+        return entries
+
+    def apply(self, connection, changes):
+        """ Bring the rings up to date with a changes.ChangeSet. """
+        changed = {'venues': changes.venues, 'artists': changes.artists, 'shows': changes.shows}
+        for kind, (model, stmt) in KINDS.items():
+            ring = self.ring.get(kind)
+            if ring is None:
+                # Loaded when first read
+                continue
+            if _stale(kind, ring, changes):
+                self.load(connection, kind)
+                continue
+            newest = max((entry['id'] for entry in ring), default=0)
+            # Only the newest rows can make it into the ring (bulk imports mark thousands)
+            new = sorted(id for id in changed[kind] if id > newest)[-self.ring.size:]
+            if new:
+                self.ring.push(kind, _entries(connection, stmt.where(model.id.in_(new)).order_by(model.id)))
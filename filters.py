@@ -0,0 +1,137 @@
+from sqlalchemy import and_, false, func, select
+
+from enums import Genre, State
+from models import Venue, Artist
+
+# Genre/state filters of the venue and artist listings, their searches and the
+# API: ?genre=Jazz&genre=Blues (&match=any) &state=NY &upcoming=1
+# genres is an array of genre codes (models.GenreSet): a genre filter is one
+# @> (all) or && (any), answered from its GIN index.
+#
+# The counts of the filter sidebar (facets) come from one aggregate query per
+# listing and are cached with the listing's tag, so the sidebar costs at most
+# one query however many genres and states it shows.
+
+# Cache tag of the listing a model's facets belong to
+TAGS = {Venue: 'venues', Artist: 'artists'}
+
+
+class Filters:
+    """ The genre/state/upcoming filters of a request. """
+
+    def __init__(self, genres=(), states=(), upcoming=False, match='all'):
+        self.genres = sorted(set(genres))
+        self.states = sorted({state.upper() for state in states})
+        self.upcoming = upcoming
+        self.match = 'any' if match == 'any' else 'all'
+
+    @classmethod
+    def from_args(cls, args):
+        """ Filters of request.args (listings, API) or request.form (searches). """
+        return cls(
+            args.getlist('genre'),
+            args.getlist('state'),
+            args.get('upcoming', '').lower() in ('1', 'true', 'on', 'yes'),
+            args.get('match', 'all')
+        )
+
+    def __bool__(self):
+        return bool(self.genres or self.states or self.upcoming)
+
+    def items(self):
+        """ (name, value) pairs of the filters, e.g. for hidden form fields. """
+        pairs = [('genre', genre) for genre in self.genres] + [('state', state) for state in self.states]
+        if self.upcoming:
+            pairs.append(('upcoming', '1'))
+        if self.match == 'any' and self.genres:
+            pairs.append(('match', 'any'))
+        return pairs
+
+    def key(self):
+        return '&'.join(f'{name}={value}' for name, value in self.items())
+
+
+def genre_filter(column, genres, match='all'):
+    """ Has every one of genres or, with match='any', at least one. """
+    return column.has_any(genres) if match == 'any' else column.has_all(genres)
+
+
+def _genre_conditions(model, filters):
+    return [genre_filter(model.genres, filters.genres, filters.match)] if filters.genres else []
+
+
+def _state_conditions(model, filters):
+    if not filters.states:
+        return []
+    states = [state for state in filters.states if state in State.__members__]
+    # Only unknown states: nothing matches
+    return [model.state.in_(states) if states else false()]
+
+
+def _upcoming_conditions(model, filters):
+    return [model.upcoming_show_count > 0] if filters.upcoming else []
+
+
+def conditions(model, filters):
+    """ WHERE conditions of filters on model's columns. """
+    return _genre_conditions(model, filters) + _state_conditions(model, filters) + _upcoming_conditions(model, filters)
+
+
+def facets_query(model, filters, where=()):
+    """ One row per state with its number of rows under the genre filter, and
+    its number of rows per genre: (state, state_count, <genre name>, ...).
+    The genre counts are added up over the states the state filter keeps, so
+    each dimension is counted with the other dimension's filter (not its own,
+    so that every choice shows what selecting it would give).
+    """
+    rows = func.count(model.id)
+    genre_conditions = _genre_conditions(model, filters)
+    return (
+        select(
+            model.state,
+            (rows.filter(and_(*genre_conditions)) if genre_conditions else rows).label('state_count'),
+            *(rows.filter(model.genres.has_all([genre.name])).label(genre.name) for genre in Genre)
+        )
+        .where(*_upcoming_conditions(model, filters), *where)
+        .group_by(model.state)
+    )
+
+
+def _facet(value, label, count, selected):
+    return {'value': value, 'label': label, 'count': count, 'selected': selected}
+
+
+def facets(session, model, filters, where=(), key='', cache=None):
+    """ Sidebar facets {'genre': [...], 'state': [...]}, each a list of
+    {value, label, count, selected}, most common first. where narrows the rows
+    counted (e.g. a search condition); key must then identify it for the cache.
+    """
+    cache_key = f'facets:{model.__tablename__}:{key}:{filters.key()}'
+    result = cache.get(cache_key) if cache is not None else None
+    if result is not None:
+        return result
+
+    genre_counts, state_counts = dict.fromkeys(Genre.__members__, 0), {}
+    for row in session.execute(facets_query(model, filters, where)):
+        if row.state is not None:
+            state_counts[row.state] = row.state_count
+        if not filters.states or row.state in filters.states:
+            for name in genre_counts:
+                genre_counts[name] += row._mapping[name]
+
+    result = {
+        'genre': [
+            _facet(genre.name, genre.value, genre_counts[genre.name], genre.name in filters.genres)
+            for genre in Genre
+            if genre_counts[genre.name] or genre.name in filters.genres
+        ],
+        'state': [
+            _facet(state, state, count, state in filters.states)
+            for state, count in state_counts.items()
+        ] + [_facet(state, state, 0, True) for state in filters.states if state not in state_counts],
+    }
+    result['genre'].sort(key=lambda facet: -facet['count'])
+    result['state'].sort(key=lambda facet: (-facet['count'], facet['value']))
+    if cache is not None:
+        cache.set(cache_key, result, [TAGS[model]])
+    return result
@@ -0,0 +1,49 @@
+from datetime import datetime
+from functools import lru_cache
+
+from babel import Locale
+from babel.dates import parse_pattern
+from sqlalchemy import func
+
+# Show times reach the templates as datetime objects and are formatted once,
+# by the `datetime` filter, with Babel patterns compiled once per process.
+# Listing pages can instead have Postgres format them (to_char) with the
+# equivalent SQL patterns.
+
+# Named formats of the `datetime` filter (Babel/CLDR patterns)
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+# The same formats as to_char() patterns (English names, like locale 'en')
+SQL_FORMATS = {
+    'full': 'FMDay FMMonth, FMDD, YYYY "at" FMHH12:MIAM',
+    'medium': 'Dy MM, DD, YYYY FMHH12:MIAM',
+}
+
+
+@lru_cache(maxsize=None)
+def _locale(name):
+    return Locale.parse(name)
+
+
+@lru_cache(maxsize=256)
+def _pattern(format):
+    return parse_pattern(FORMATS.get(format, format))
+
+
+def format_datetime(value, format='medium', locale='en'):
+    """ Format a datetime (or an ISO 8601 string) with a named format or a
+    Babel pattern.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return _pattern(format).apply(value, _locale(locale))
+
+
+def sql_datetime(column, format='full'):
+    """ SQL expression formatting column like format_datetime(), for Postgres. """
+    return func.to_char(column, SQL_FORMATS[format])
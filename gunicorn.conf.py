@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+
+# Production server: gunicorn -c gunicorn.conf.py app:app
+#
+# Settings are read from the environment:
+#   BIND            address to listen on (0.0.0.0:5000)
+#   WORKER_CLASS    sync, gthread (default) or gevent (needs gevent and psycogreen)
+#   WEB_CONCURRENCY worker processes (2 x cores + 1)
+#   THREADS         threads per gthread worker (4)
+#
+# The app is loaded once in the master and the workers are forked from it, so
+# they share its memory copy-on-write. Because of that, `kill -HUP` restarts
+# the workers without loading new code; to deploy new code without dropping
+# requests, send USR2 (starts a new master), then TERM to the old master.
+
+os.environ.setdefault('FYYUR_ENV', 'production')
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+worker_class = os.environ.get('WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))  # gevent only
+
+preload_app = True
+
+# Restart workers now and then to bound memory growth; jitter avoids restarting them all at once
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 1000))
+
+timeout = int(os.environ.get('TIMEOUT', 30))
+# Time given to in-flight requests on shutdown and reload
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    from config import profile
+    # A worker only invalidates its own memory cache: the others would keep
+    # serving the pages of a change until CACHE_TTL
+    if profile().CACHE_TYPE == 'memory' and server.cfg.workers > 1:
+        raise RuntimeError(f"CACHE_TYPE 'memory' is not shared by the {server.cfg.workers} workers; "
+                           "use 'redis' (CACHE_REDIS_URL) or WEB_CONCURRENCY=1")
+
+    # Metrics of a previous run would be added to this one's
+    import metrics
+    if profile().METRICS_DIR:
+        metrics.reset(profile().METRICS_DIR)
+
+
+def worker_exit(server, worker):
+    # The last DUMP_INTERVAL of the worker's metrics
+    from app import metrics
+    if metrics.directory:
+        metrics.dump()
+
+
+def child_exit(server, worker):
+    # Keep the counts of a worker that exited (max_requests, crash) in the totals
+    from config import profile
+    import metrics
+    if profile().METRICS_DIR:
+        metrics.retire(profile().METRICS_DIR, worker.pid)
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared by the forked workers,
+    # whichever engine (primary or read replica) opened them
+    from app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    if worker_class == 'gevent':
+        # Make psycopg2 cooperative, otherwise every query blocks the whole worker
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,261 @@
+import csv
+import io
+import json
+import time
+from itertools import groupby
+
+from sqlalchemy import insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+import changes
+from forms import VenueForm, ArtistForm, ShowForm
+from models import Venue, Artist, Show
+
+# Bulk import of venues, artists and shows from CSV or NDJSON.
+# Rows are read one at a time, validated with the same forms as the web UI and
+# written in batches (executemany, upserting on id when one is given), so memory
+# stays constant whatever the size of the input.
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def _venue(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data,
+    }
+
+
+def _artist(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'genres': form.genres.data,
+        'facebook_link': form.facebook_link.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data,
+    }
+
+
+def _show(form):
+    return {
+        'artist_id': int(form.artist_id.data),
+        'venue_id': int(form.venue_id.data),
+        'start_time': form.start_time.data,
+    }
+
+
+# kind -> (model, form, form data -> column values)
+KINDS = {
+    'venues': (Venue, VenueForm, _venue),
+    'artists': (Artist, ArtistForm, _artist),
+    'shows': (Show, ShowForm, _show),
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.failed = 0
+        self.errors = []  # (line, message), the first MAX_REPORTED_ERRORS only
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'written': self.written,
+            'failed': self.failed,
+            'errors': [{'line': line, 'message': message} for line, message in self.errors],
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def read_rows(stream, fmt):
+    """ Yield (line number, dict) from a text stream of CSV (with a header row)
+    or NDJSON. In CSV, multi-valued fields such as genres are comma separated.
+    An NDJSON line that does not parse is yielded as its ValueError.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, _split_lists(row)
+    elif fmt == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+def _split_lists(row):
+    if row.get('genres'):
+        row['genres'] = [genre.strip() for genre in row['genres'].split(',') if genre.strip()]
+    return row
+
+
+def text_stream(binary):
+    """ Wrap a binary stream (e.g. an upload) for read_rows(). """
+    return io.TextIOWrapper(binary, encoding='utf-8', newline='')
+
+
+def _formdata(record):
+    data = MultiDict()
+    for key, value in record.items():
+        if value is None:
+            continue
+        if isinstance(value, list):
+            data.setlist(key, [str(v) for v in value])
+        elif isinstance(value, bool):
+            # BooleanField: any submitted value means checked
+            if value:
+                data[key] = 'y'
+        else:
+            data[key] = str(value)
+    return data
+
+
+def _upsert(session, model, rows):
+    """ INSERT rows, updating the existing row when the id is already taken. """
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        return insert(table)
+    stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+    columns = [column for column in rows[0] if column != 'id']
+    return stmt.on_conflict_do_update(
+        index_elements=['id'],
+        set_={column: stmt.excluded[column] for column in columns}
+    )
+
+
+def _execute(session, model, rows):
+    """ One executemany for rows of the same shape; returns the written ids. """
+    table = model.__table__
+    stmt = _upsert(session, model, rows) if rows[0].get('id') is not None else insert(table)
+    return session.execute(stmt.returning(table.c.id), rows).scalars().all()
+
+
+def _sync_id_sequence(session, model, ids):
+    # Explicit ids do not advance a Postgres serial sequence: move it past them,
+    # or the next row created without an id would collide with one of them
+    if not ids or session.get_bind().dialect.name != 'postgresql':
+        return
+    session.execute(text("""
+        SELECT setval(seq, :top)
+        FROM (SELECT pg_get_serial_sequence(:table, 'id')::regclass AS seq) AS serial
+        WHERE :top > coalesce(pg_sequence_last_value(seq), 0)
+    """), {'table': model.__tablename__, 'top': max(ids)})
+
+
+def _runs(batch):
+    # Consecutive rows with an id, and without one: one executemany each, in input order
+    for has_id, run in groupby(batch, key=lambda item: item[1].get('id') is not None):
+        yield [values for line, values in run]
+
+
+def _write(session, model, batch, report):
+    """ Write a batch of (line, values) and commit it. Each run of consecutive
+    rows with (or without) an id goes in as one executemany, in input order;
+    if that fails, rows are retried one by one so that only the offending ones
+    are reported.
+    """
+    written, ids = [], []
+    try:
+        with session.begin_nested():
+            for rows in _runs(batch):
+                ids += _execute(session, model, rows)
+        written = [values for line, values in batch]
+    except SQLAlchemyError:
+        ids = []
+        for line, values in batch:
+            try:
+                with session.begin_nested():
+                    ids += _execute(session, model, [values])
+                written.append(values)
+            except SQLAlchemyError as e:
+                report.error(line, str(getattr(e, 'orig', e)).strip())
+
+    report.written += len(written)
+    _sync_id_sequence(session, model, [values['id'] for values in written if values.get('id') is not None])
+    _mark(session, model, ids, written)
+    session.commit()
+
+
+def _mark(session, model, ids, rows):
+    # Core statements are invisible to the ORM; tell the change subscribers
+    if model is Venue:
+        changes.mark(session, venues=ids)
+    elif model is Artist:
+        changes.mark(session, artists=ids)
+    else:
+        changes.mark(session, shows=ids,
+                     show_venues={values['venue_id'] for values in rows},
+                     show_artists={values['artist_id'] for values in rows})
+
+
+def run(session, kind, rows, batch_size=1000):
+    """ Validate and write rows, an iterable of (line, dict) from read_rows().
+    Returns an ImportReport.
+    """
+    model, form_class, to_values = KINDS[kind]
+    report = ImportReport()
+    batch = []
+
+    for line, record in rows:
+        report.read += 1
+        if isinstance(record, ValueError):
+            report.error(line, f"Invalid JSON: {record}")
+            continue
+        if not isinstance(record, dict):
+            report.error(line, 'Expected an object')
+            continue
+        form = form_class(formdata=_formdata(record), meta={'csrf': False})
+        if not form.validate():
+            report.error(line, '; '.join(f"{field}: {', '.join(errors)}" for field, errors in form.errors.items()))
+            continue
+        try:
+            values = to_values(form)
+            if record.get('id') not in (None, ''):
+                values['id'] = int(record['id'])
+        except (TypeError, ValueError) as e:
+            report.error(line, f"Not a valid integer: {e}")
+            continue
+        batch.append((line, values))
+        if len(batch) >= batch_size:
+            _write(session, model, batch, report)
+            batch = []
+
+    if batch:
+        _write(session, model, batch, report)
+    report.elapsed = time.monotonic() - report.started
+    return report
@@ -0,0 +1,36 @@
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import load_only, raiseload
+
+from models import Venue, Artist
+
+# Loader policies.
+# Venue.shows and Artist.shows are lazy by default; every route declares
+# what it needs with one of these option tuples: query(...).options(*POLICY)
+
+# Search results: names plus the denormalized upcoming show count.
+VENUE_SEARCH = (load_only(Venue.id, Venue.name, Venue.upcoming_show_count), raiseload('*'))
+ARTIST_SEARCH = (load_only(Artist.id, Artist.name, Artist.upcoming_show_count), raiseload('*'))
+
+# Edit forms: every column, no relationships.
+VENUE_FORM = (raiseload(Venue.shows),)
+ARTIST_FORM = (raiseload(Artist.shows),)
+
+# Detail pages: every column; the shows come from the page summary (summaries.py).
+VENUE_DETAIL = (raiseload('*'),)
+ARTIST_DETAIL = (raiseload('*'),)
+
+def raise_on_lazy_loads(session):
+    """ Make any lazy load that a route did not plan for raise instead of
+    silently issuing an extra query. Meant for tests and local debugging.
+    """
+    @event.listens_for(session, 'do_orm_execute')
+    def _check(orm_execute_state):
+        if not orm_execute_state.is_select:
+            return
+        state = orm_execute_state.lazy_loaded_from
+        if state is not None:
+            raise InvalidRequestError(
+                f"Unplanned lazy load on {state.class_.__name__}; "
+                f"add it to the route's loader policy"
+            )
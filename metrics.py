@@ -0,0 +1,240 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request instrumentation: SQL statement count, DB time, template render
+# time and total latency per endpoint. Exposed as Prometheus histograms on
+# /metrics and as a Server-Timing header on every response.
+#
+# Values are kept per worker process. With several workers (gunicorn), set
+# METRICS_DIR: each worker then writes its histograms there (at most every
+# DUMP_INTERVAL seconds) and a scrape, whichever worker answers it, adds up
+# every worker's file. The files of exited workers are folded into one
+# (retire()) so that their counts are kept; the directory is emptied when the
+# server starts. The connection pool gauges remain those of the worker that
+# answers the scrape.
+
+logger = logging.getLogger('fyyur.slow_query')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+DUMP_INTERVAL = 1.0  # seconds
+RETIRED = 'retired.json'
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # endpoint -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, value):
+        with self._lock:
+            series = self._series.get(endpoint)
+            if series is None:
+                series = self._series[endpoint] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        """ {endpoint: [bucket counts..., sum, count]}, a copy. """
+        with self._lock:
+            return {endpoint: list(series) for endpoint, series in self._series.items()}
+
+    def exposition(self, snapshot=None):
+        """ Exposition lines of snapshot (by default this process' values). """
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for endpoint, series in sorted(snapshot.items()):
+            label = f'endpoint="{endpoint}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{label}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{label}}} {series[-1]}')
+        return lines
+
+
+def merge(snapshots):
+    """ Add up {histogram name: {endpoint: series}} snapshots. """
+    total = {}
+    for snapshot in snapshots:
+        for name, histogram in snapshot.items():
+            merged = total.setdefault(name, {})
+            for endpoint, series in histogram.items():
+                current = merged.get(endpoint)
+                merged[endpoint] = list(series) if current is None else [a + b for a, b in zip(current, series)]
+    return total
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write(path, snapshot):
+    # Written aside and swapped in, so a scrape never reads half a file
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def reset(directory):
+    """ Empty METRICS_DIR; when the server (re)starts. """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def retire(directory, pid):
+    """ Fold the file of an exited worker into the retired workers' totals. """
+    path = os.path.join(directory, f'{pid}.json')
+    if not os.path.exists(path):
+        return
+    retired = os.path.join(directory, RETIRED)
+    _write(retired, merge([_read(retired), _read(path)]))
+    os.remove(path)
+
+
+def gauge(name, help, value):
+    """ Exposition lines of a single gauge. """
+    return [f'# HELP {name} {help}', f'# TYPE {name} gauge', f'{name} {value}']
+
+
+class TimedTemplate(Template):
+    """ Template that adds its render time to the current request's metrics. """
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_request_context() and 'metrics' in g:
+                g.metrics['render'] += time.perf_counter() - start
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.latency = Histogram('fyyur_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS)
+        self.db_time = Histogram('fyyur_db_duration_seconds', 'Time spent executing SQL per request.', LATENCY_BUCKETS)
+        self.render_time = Histogram('fyyur_render_duration_seconds', 'Template render time per request.', LATENCY_BUCKETS)
+        self.statements = Histogram('fyyur_db_statements', 'SQL statements executed per request.', COUNT_BUCKETS)
+        self.slow_query_seconds = None
+        self.directory = None
+        self._next_dump = 0.0
+        self._collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        slow_query_ms = app.config.get('SLOW_QUERY_MS')
+        self.slow_query_seconds = slow_query_ms / 1000 if slow_query_ms else None
+        self.server_timing = app.config.get('SERVER_TIMING_HEADER', True)
+        self.directory = app.config.get('METRICS_DIR') or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.exposition)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(Engine, 'handle_error', self._handle_error)
+        app.extensions['metrics'] = self
+
+    def _before_request(self):
+        g.metrics = {'start': time.perf_counter(), 'statements': 0, 'db': 0.0, 'render': 0.0}
+
+    def _after_request(self, response):
+        stats = g.pop('metrics', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats['start']
+        endpoint = request.endpoint or 'unknown'
+        if endpoint != 'metrics':
+            self.latency.observe(endpoint, total)
+            self.db_time.observe(endpoint, stats['db'])
+            self.render_time.observe(endpoint, stats['render'])
+            self.statements.observe(endpoint, stats['statements'])
+            if self.directory and time.monotonic() >= self._next_dump:
+                self.dump()
+        if self.server_timing:
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats["db"] * 1000:.1f};desc="{stats["statements"]} queries", '
+                f'tpl;dur={stats["render"] * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context() and 'metrics' in g:
+            g.metrics['statements'] += 1
+            g.metrics['db'] += elapsed
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            logger.warning('Slow query (%.1f ms): %s -- parameters: %r', elapsed * 1000, statement, parameters)
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute: drop its start
+        # time, or every later statement on the connection is timed from the wrong one
+        if context.connection is None or context.execution_context is None:
+            return
+        starts = context.connection.info.get('query_start')
+        if starts:
+            elapsed = time.perf_counter() - starts.pop()
+            if has_request_context() and 'metrics' in g:
+                g.metrics['statements'] += 1
+                g.metrics['db'] += elapsed
+
+    def collector(self, callback):
+        """ Add callback() -> exposition lines to the /metrics output. """
+        self._collectors.append(callback)
+        return callback
+
+    @property
+    def histograms(self):
+        return (self.latency, self.db_time, self.render_time, self.statements)
+
+    def snapshot(self):
+        return {histogram.name: histogram.snapshot() for histogram in self.histograms}
+
+    def dump(self):
+        """ Write this worker's histograms to METRICS_DIR/<pid>.json. """
+        self._next_dump = time.monotonic() + DUMP_INTERVAL
+        _write(os.path.join(self.directory, f'{os.getpid()}.json'), self.snapshot())
+
+    def exposition(self):
+        if self.directory:
+            self.dump()
+            paths = glob.glob(os.path.join(self.directory, '*.json'))
+            snapshot = merge(_read(path) for path in paths)
+        else:
+            snapshot = self.snapshot()
+        lines = []
+        for histogram in self.histograms:
+            lines += histogram.exposition(snapshot.get(histogram.name, {}))
+        for callback in self._collectors:
+            lines += callback()
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
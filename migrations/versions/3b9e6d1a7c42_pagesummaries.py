@@ -0,0 +1,37 @@
+"""pageSummaries
+
+Revision ID: 3b9e6d1a7c42
+Revises: 7f4a0c2d93e5
+Create Date: 2026-10-18 14:08:31.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e6d1a7c42'
+down_revision = '7f4a0c2d93e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by `flask refresh-summaries --all`; until then pages build their lists on the fly
+    for table in ('venue', 'artist'):
+        op.create_table(f'{table}_summary',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('upcoming_shows', sa.JSON(), nullable=False),
+        sa.Column('past_shows', sa.JSON(), nullable=False),
+        sa.Column('next_show_at', sa.DateTime(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(f'{table}_id')
+        )
+        op.create_index(f'ix_{table}_summary_next_show_at', f'{table}_summary', ['next_show_at'], unique=False)
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_summary_next_show_at', table_name=f'{table}_summary')
+        op.drop_table(f'{table}_summary')
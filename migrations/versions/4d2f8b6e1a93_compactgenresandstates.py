@@ -0,0 +1,89 @@
+"""compactGenresAndStates
+
+Revision ID: 4d2f8b6e1a93
+Revises: e1b74c9f2a58
+Create Date: 2026-10-18 19:37:12.448210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4d2f8b6e1a93'
+down_revision = 'e1b74c9f2a58'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venue', 'artist')
+
+# enums.Genre names, in declaration order (bit i = i-th genre), as of this revision
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip_Hop',
+          'Heavy_Metal', 'Instrumental', 'Jazz', 'Musical_Theatre', 'Pop', 'Punk', 'R_and_B', 'Reggae',
+          'Rock_n_Roll', 'Soul', 'Other']
+# Arrays may also hold the display values
+GENRE_VALUES = {'Hip_Hop': 'Hip-Hop', 'Heavy_Metal': 'Heavy Metal', 'Musical_Theatre': 'Musical Theatre',
+                'R_and_B': 'R&B', 'Rock_n_Roll': 'Rock n Roll'}
+
+# enums.State values, alphabetical so that ORDER BY state does not change
+STATES = ['AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'IA', 'ID', 'IL', 'IN',
+          'KS', 'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN', 'MO', 'MS', 'MT', 'NC', 'ND', 'NE', 'NH', 'NJ',
+          'NM', 'NV', 'NY', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA',
+          'WI', 'WV', 'WY']
+
+state_enum = postgresql.ENUM(*STATES, name='state', create_type=False)
+
+
+def _bits(with_values):
+    rows = []
+    for i, name in enumerate(GENRES):
+        rows.append(f"('{name}', {1 << i})")
+        if with_values and name in GENRE_VALUES:
+            rows.append(f"('{GENRE_VALUES[name]}', {1 << i})")
+    return f"(VALUES {', '.join(rows)}) AS bits(name, bit)"
+
+
+def upgrade():
+    state_enum.create(op.get_bind(), checkfirst=True)
+    states = ', '.join(f"'{state}'" for state in STATES)
+    for table in TABLES:
+        # Free-form states that are not a state code are dropped
+        op.execute(f"""
+        UPDATE {table} SET state = CASE WHEN upper(trim(state)) IN ({states}) THEN upper(trim(state)) END
+        """)
+        op.alter_column(table, 'state', type_=state_enum, existing_nullable=True,
+                        postgresql_using='state::state')
+
+        op.add_column(table, sa.Column('genre_bits', sa.Integer(), nullable=False, server_default='0'))
+        op.execute(f"""
+        UPDATE {table} SET genre_bits = (
+            SELECT coalesce(bit_or(bits.bit), 0)
+            FROM unnest({table}.genres) AS genre
+            JOIN {_bits(with_values=True)} ON bits.name = genre
+        )
+        WHERE genres IS NOT NULL
+        """)
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        op.drop_column(table, 'genres')
+        op.alter_column(table, 'genre_bits', new_column_name='genres')
+
+
+def downgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('genre_names', postgresql.ARRAY(sa.String()), nullable=True))
+        op.execute(f"""
+        UPDATE {table} SET genre_names = ARRAY(
+            SELECT bits.name FROM {_bits(with_values=False)}
+            WHERE {table}.genres & bits.bit <> 0
+            ORDER BY bits.bit
+        )
+        """)
+        op.drop_column(table, 'genres')
+        op.alter_column(table, 'genre_names', new_column_name='genres')
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False, postgresql_using='gin')
+
+        op.alter_column(table, 'state', type_=sa.String(length=120), existing_nullable=True,
+                        postgresql_using='state::text')
+    state_enum.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,37 @@
+"""searchTrigramIndexes
+
+Revision ID: 5c1e2f7a9b3d
+Revises: 092b43f73f2e
+Create Date: 2026-10-18 09:12:31.204417
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e2f7a9b3d'
+down_revision = '092b43f73f2e'
+branch_labels = None
+depends_on = None
+
+
+TRGM_INDEXES = [
+    ('ix_venue_name_trgm', 'venue', 'name'),
+    ('ix_venue_city_trgm', 'venue', 'city'),
+    ('ix_artist_name_trgm', 'artist', 'name'),
+    ('ix_artist_city_trgm', 'artist', 'city'),
+]
+
+
+def upgrade():
+    # Trigram GIN indexes serve ILIKE '%term%' without a sequential scan
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    for name, table, column in reversed(TRGM_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,48 @@
+"""updatedAtTimestamps
+
+Revision ID: 7f4a0c2d93e5
+Revises: d2b7e94f1c08
+Create Date: 2026-10-18 11:26:52.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f4a0c2d93e5'
+down_revision = 'd2b7e94f1c08'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venue', 'artist', 'show')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("timezone('utc', now())")))
+
+    # Keep updated_at current for statements that bypass the ORM (imports, triggers)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at = timezone('utc', now());
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    for table in TABLES:
+        op.execute(f"""
+        CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+        """)
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_touch_updated_at ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS touch_updated_at()")
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
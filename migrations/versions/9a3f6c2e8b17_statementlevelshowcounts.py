@@ -0,0 +1,106 @@
+"""statementLevelShowCounts
+
+Revision ID: 9a3f6c2e8b17
+Revises: 4d2f8b6e1a93
+Create Date: 2026-10-18 21:14:05.302117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3f6c2e8b17'
+down_revision = '4d2f8b6e1a93'
+branch_labels = None
+depends_on = None
+
+
+# Statement-level triggers with transition tables: however many shows one
+# statement writes (bulk import, batched purge, ON DELETE CASCADE), each venue
+# and artist it touches is recounted exactly once, instead of twice per show
+# row. Recounting (rather than adding +1/-1) keeps the counts exact even for a
+# show deleted after it started but before refresh-show-counts moved it to
+# the past count. The UPDATEs also bump updated_at, the pages' ETag.
+#
+# Postgres allows transition tables only on single-event triggers without a
+# column list, hence one trigger per event; an UPDATE that leaves venue_id,
+# artist_id and start_time alone touches nothing.
+CHANGED = {
+    'insert': "SELECT venue_id, artist_id FROM new_shows",
+    'update': """SELECT moved.venue_id, moved.artist_id
+                 FROM old_shows o JOIN new_shows n ON n.id = o.id,
+                      LATERAL (VALUES (o.venue_id, o.artist_id), (n.venue_id, n.artist_id)) AS moved (venue_id, artist_id)
+                 WHERE (o.venue_id, o.artist_id, o.start_time) IS DISTINCT FROM (n.venue_id, n.artist_id, n.start_time)""",
+    'delete': "SELECT venue_id, artist_id FROM old_shows",
+}
+
+REFERENCING = {
+    'insert': 'NEW TABLE AS new_shows',
+    'update': 'OLD TABLE AS old_shows NEW TABLE AS new_shows',
+    'delete': 'OLD TABLE AS old_shows',
+}
+
+
+def _recount(table, column, event):
+    # start_time is stored without time zone, so compare against LOCALTIMESTAMP
+    return f"""
+        UPDATE {table} SET
+            upcoming_show_count = (SELECT count(*) FROM show WHERE show.{column} = {table}.id AND show.start_time > LOCALTIMESTAMP),
+            past_show_count = (SELECT count(*) FROM show WHERE show.{column} = {table}.id AND show.start_time <= LOCALTIMESTAMP),
+            updated_at = timezone('utc', now())
+        WHERE {table}.id IN (SELECT {column} FROM ({CHANGED[event]}) AS changed);"""
+
+
+def trigger_function(event):
+    return f"""
+    CREATE OR REPLACE FUNCTION show_counts_{event}() RETURNS trigger AS $$
+    BEGIN{_recount('venue', 'venue_id', event)}{_recount('artist', 'artist_id', event)}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+
+
+def upgrade():
+    op.execute("DROP TRIGGER IF EXISTS show_counts ON show")
+    op.execute("DROP FUNCTION IF EXISTS show_counts_trigger()")
+    for event in CHANGED:
+        op.execute(trigger_function(event))
+        op.execute(f"""
+        CREATE TRIGGER show_counts_{event}
+        AFTER {event.upper()} ON show
+        REFERENCING {REFERENCING[event]}
+        FOR EACH STATEMENT EXECUTE FUNCTION show_counts_{event}();
+        """)
+
+    # Recounted as shows change from here on; start from exact counts
+    op.execute("SELECT refresh_venue_show_counts(id) FROM venue")
+    op.execute("SELECT refresh_artist_show_counts(id) FROM artist")
+
+
+def downgrade():
+    for event in CHANGED:
+        op.execute(f"DROP TRIGGER IF EXISTS show_counts_{event} ON show")
+        op.execute(f"DROP FUNCTION IF EXISTS show_counts_{event}()")
+
+    # The row-level recount trigger of a83d4c61e0f2
+    op.execute("""
+    CREATE OR REPLACE FUNCTION show_counts_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM refresh_venue_show_counts(OLD.venue_id);
+            PERFORM refresh_artist_show_counts(OLD.artist_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM refresh_venue_show_counts(NEW.venue_id);
+            PERFORM refresh_artist_show_counts(NEW.artist_id);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+    CREATE TRIGGER show_counts
+    AFTER INSERT OR UPDATE OF venue_id, artist_id, start_time OR DELETE ON show
+    FOR EACH ROW EXECUTE FUNCTION show_counts_trigger();
+    """)
@@ -0,0 +1,73 @@
+"""denormalizedShowCounts
+
+Revision ID: a83d4c61e0f2
+Revises: 5c1e2f7a9b3d
+Create Date: 2026-10-18 10:02:47.881390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83d4c61e0f2'
+down_revision = '5c1e2f7a9b3d'
+branch_labels = None
+depends_on = None
+
+
+def refresh_function(table, column):
+    # start_time is stored without time zone, so compare against LOCALTIMESTAMP
+    return f"""
+    CREATE OR REPLACE FUNCTION refresh_{table}_show_counts(target integer) RETURNS void AS $$
+        UPDATE {table} SET
+            upcoming_show_count = (SELECT count(*) FROM show
+                                   WHERE {column} = target AND start_time > LOCALTIMESTAMP),
+            past_show_count = (SELECT count(*) FROM show
+                               WHERE {column} = target AND start_time <= LOCALTIMESTAMP)
+        WHERE id = target;
+    $$ LANGUAGE sql;
+    """
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_show_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(refresh_function('venue', 'venue_id'))
+    op.execute(refresh_function('artist', 'artist_id'))
+    op.execute("""
+    CREATE OR REPLACE FUNCTION show_counts_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM refresh_venue_show_counts(OLD.venue_id);
+            PERFORM refresh_artist_show_counts(OLD.artist_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM refresh_venue_show_counts(NEW.venue_id);
+            PERFORM refresh_artist_show_counts(NEW.artist_id);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+    CREATE TRIGGER show_counts
+    AFTER INSERT OR UPDATE OF venue_id, artist_id, start_time OR DELETE ON show
+    FOR EACH ROW EXECUTE FUNCTION show_counts_trigger();
+    """)
+
+    # Backfill
+    op.execute("SELECT refresh_venue_show_counts(id) FROM venue")
+    op.execute("SELECT refresh_artist_show_counts(id) FROM artist")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS show_counts ON show")
+    op.execute("DROP FUNCTION IF EXISTS show_counts_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_artist_show_counts(integer)")
+    op.execute("DROP FUNCTION IF EXISTS refresh_venue_show_counts(integer)")
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'past_show_count')
+        op.drop_column(table, 'upcoming_show_count')
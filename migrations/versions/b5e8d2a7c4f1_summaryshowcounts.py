@@ -0,0 +1,45 @@
+"""summaryShowCounts
+
+Revision ID: b5e8d2a7c4f1
+Revises: 9a3f6c2e8b17
+Create Date: 2026-10-18 23:02:16.745390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8d2a7c4f1'
+down_revision = '9a3f6c2e8b17'
+branch_labels = None
+depends_on = None
+
+
+# summary table -> (its key, show column of the other side, other table)
+SIDES = {
+    'venue_summary': ('venue_id', 'artist_id', 'artist'),
+    'artist_summary': ('artist_id', 'venue_id', 'venue'),
+}
+
+
+def upgrade():
+    for table, (key, other_key, other) in SIDES.items():
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_show_count', sa.Integer(), server_default='0', nullable=False))
+        # Counted as of the refresh that built the lists, like summaries.build()
+        op.execute(f"""
+        UPDATE {table} SET
+            upcoming_show_count = (SELECT count(*) FROM show JOIN {other} ON {other}.id = show.{other_key}
+                                   WHERE show.{key} = {table}.{key} AND {other}.deleted_at IS NULL
+                                     AND show.start_time > {table}.refreshed_at),
+            past_show_count = (SELECT count(*) FROM show JOIN {other} ON {other}.id = show.{other_key}
+                               WHERE show.{key} = {table}.{key} AND {other}.deleted_at IS NULL
+                                 AND show.start_time <= {table}.refreshed_at)
+        """)
+
+
+def downgrade():
+    for table in SIDES:
+        op.drop_column(table, 'past_show_count')
+        op.drop_column(table, 'upcoming_show_count')
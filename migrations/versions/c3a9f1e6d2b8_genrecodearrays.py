@@ -0,0 +1,53 @@
+"""genreCodeArrays
+
+Revision ID: c3a9f1e6d2b8
+Revises: b5e8d2a7c4f1
+Create Date: 2026-10-18 23:41:08.219846
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9f1e6d2b8'
+down_revision = 'b5e8d2a7c4f1'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venue', 'artist')
+
+# Genres of 4d2f8b6e1a93 (bit i = code i)
+GENRE_COUNT = 19
+
+
+# The bitmask of 4d2f8b6e1a93 cannot use an index: genre filters and facets
+# scanned every row. An array of genre codes keeps the column as compact and
+# gets back the GIN index of e1b74c9f2a58 (genres @> / && ARRAY[...]).
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('genre_codes', postgresql.ARRAY(sa.SmallInteger()), nullable=False,
+                                       server_default='{}'))
+        op.execute(f"""
+        UPDATE {table} SET genre_codes = ARRAY(
+            SELECT code FROM generate_series(0, {GENRE_COUNT - 1}) AS code
+            WHERE genres & (1 << code) <> 0
+            ORDER BY code
+        )::smallint[]
+        """)
+        op.drop_column(table, 'genres')
+        op.alter_column(table, 'genre_codes', new_column_name='genres')
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        op.add_column(table, sa.Column('genre_bits', sa.Integer(), nullable=False, server_default='0'))
+        op.execute(f"""
+        UPDATE {table} SET genre_bits = (SELECT coalesce(bit_or(1 << code), 0) FROM unnest(genres) AS code)
+        """)
+        op.drop_column(table, 'genres')
+        op.alter_column(table, 'genre_bits', new_column_name='genres')
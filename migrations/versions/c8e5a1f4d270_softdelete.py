@@ -0,0 +1,32 @@
+"""softDelete
+
+Revision ID: c8e5a1f4d270
+Revises: 3b9e6d1a7c42
+Create Date: 2026-10-18 16:42:09.283615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e5a1f4d270'
+down_revision = '3b9e6d1a7c42'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venue', 'artist')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table}_deleted_at', table, ['deleted_at'], unique=False,
+                        postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_deleted_at', table_name=table)
+        op.drop_column(table, 'deleted_at')
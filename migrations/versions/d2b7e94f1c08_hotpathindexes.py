@@ -0,0 +1,42 @@
+"""hotPathIndexes
+
+Revision ID: d2b7e94f1c08
+Revises: a83d4c61e0f2
+Create Date: 2026-10-18 10:41:05.317802
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7e94f1c08'
+down_revision = 'a83d4c61e0f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time', 'show', ['start_time'], unique=False)
+    op.create_index('ix_venue_city_state', 'venue', ['city', 'state'], unique=False)
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+
+    # Let the database remove a venue's/artist's shows instead of the ORM
+    op.drop_constraint('show_artist_id_fkey', 'show', type_='foreignkey')
+    op.drop_constraint('show_venue_id_fkey', 'show', type_='foreignkey')
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint('show_venue_id_fkey', 'show', type_='foreignkey')
+    op.drop_constraint('show_artist_id_fkey', 'show', type_='foreignkey')
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'])
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'])
+
+    op.drop_index('ix_artist_name_id', table_name='artist')
+    op.drop_index('ix_venue_city_state', table_name='venue')
+    op.drop_index('ix_show_start_time', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
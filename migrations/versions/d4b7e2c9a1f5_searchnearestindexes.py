@@ -0,0 +1,35 @@
+"""searchNearestIndexes
+
+Revision ID: d4b7e2c9a1f5
+Revises: c3a9f1e6d2b8
+Create Date: 2026-10-18 23:58:34.610572
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b7e2c9a1f5'
+down_revision = 'c3a9f1e6d2b8'
+branch_labels = None
+depends_on = None
+
+
+TRGM_GIST_INDEXES = [
+    ('ix_venue_name_trgm_gist', 'venue', 'name'),
+    ('ix_artist_name_trgm_gist', 'artist', 'name'),
+]
+
+
+def upgrade():
+    # GiST trigram indexes: name % term, ORDER BY name <-> term LIMIT n reads
+    # the nearest names first instead of ranking every match
+    for name, table, column in TRGM_GIST_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gist',
+                        postgresql_ops={column: 'gist_trgm_ops'})
+
+
+def downgrade():
+    for name, table, column in reversed(TRGM_GIST_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,31 @@
+"""genreFilterIndexes
+
+Revision ID: e1b74c9f2a58
+Revises: c8e5a1f4d270
+Create Date: 2026-10-18 18:05:47.906131
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b74c9f2a58'
+down_revision = 'c8e5a1f4d270'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venue', 'artist')
+
+
+def upgrade():
+    for table in TABLES:
+        # genres @> ARRAY[...] / genres && ARRAY[...] (listing filters and facets)
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False, postgresql_using='gin')
+        op.create_index(f'ix_{table}_state', table, ['state'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_state', table_name=table)
+        op.drop_index(f'ix_{table}_genres', table_name=table)
@@ -1,51 +1,283 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Boolean, false
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+from sqlalchemy.types import TypeDecorator
+
+from enums import Genre, State
+from routing import RoutingSession
 
 # Initialized without explicit app (Flask instance)
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def trigram_index(table, column):
+    # GIN index for ILIKE '%term%' searches (needs the pg_trgm extension)
+    return db.Index(f'ix_{table}_{column}_trgm', column,
+                    postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def nearest_index(table, column):
+    # GiST trigram index returning the rows nearest to a term first (ORDER BY column <-> term)
+    return db.Index(f'ix_{table}_{column}_trgm_gist', column,
+                    postgresql_using='gist',
+                    postgresql_ops={column: 'gist_trgm_ops'})
+
+
+# Genre codes: code i is the i-th Genre. Append new genres to the enum, never
+# insert or reorder them (stored codes would change meaning).
+GENRE_CODES = {genre.name: i for i, genre in enumerate(Genre)}
+
+
+def genre_name(value):
+    """ Genre name of a Genre, its name or its value ('Hip_Hop' or 'Hip-Hop').
+    Raises ValueError for anything else.
+    """
+    if isinstance(value, Genre):
+        return value.name
+    if value in GENRE_CODES:
+        return value
+    return Genre(value).name
+
+
+def genre_codes(genres):
+    """ Sorted codes of some genres. """
+    return sorted({GENRE_CODES[genre_name(genre)] for genre in genres})
+
+
+class GenreMatch(ColumnElement):
+    """ column has every one (match='all') or any (match='any') of codes. """
+    type = Boolean()
+    inherit_cache = True
+    _traverse_internals = [
+        ('column', InternalTraversal.dp_clauseelement),
+        ('codes', InternalTraversal.dp_plain_obj),
+        ('match', InternalTraversal.dp_string),
+    ]
+
+    def __init__(self, column, codes, match):
+        self.column = column
+        self.codes = tuple(codes)
+        self.match = match
+
+
+@compiles(GenreMatch, 'postgresql')
+def _genre_match_array(element, compiler, **kw):
+    # @> and && on smallint[]: both answered from the GIN index on genres
+    operator = '@>' if element.match == 'all' else '&&'
+    codes = ', '.join(str(code) for code in element.codes)
+    return f"{compiler.process(element.column, **kw)} {operator} ARRAY[{codes}]::smallint[]"
+
+
+@compiles(GenreMatch)
+def _genre_match_bits(element, compiler, **kw):
+    mask = sum(1 << code for code in element.codes)
+    column = compiler.process(element.column, **kw)
+    return f"({column} & {mask}) = {mask}" if element.match == 'all' else f"({column} & {mask}) <> 0"
+
+
+class GenreSet(TypeDecorator):
+    """ A list of genre names stored as their codes: a smallint[] with a GIN
+    index on Postgres, an integer bitmask where there are no arrays (SQLite).
+    Query with column.has_all(genres) / column.has_any(genres).
+    """
+    impl = db.Integer
+    cache_ok = True
+
+    class comparator_factory(TypeDecorator.Comparator):
+        def has_all(self, genres):
+            """ Has every one of genres. """
+            try:
+                codes = genre_codes(genres)
+            except ValueError:
+                # Nothing has an unknown genre
+                return false()
+            return GenreMatch(self.expr, codes, 'all')
+
+        def has_any(self, genres):
+            """ Has at least one of genres. """
+            codes = set()
+            for genre in genres:
+                try:
+                    codes.update(genre_codes([genre]))
+                except ValueError:
+                    # Unknown genres match nothing
+                    pass
+            if not codes:
+                return false()
+            return GenreMatch(self.expr, sorted(codes), 'any')
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.ARRAY(db.SmallInteger))
+        return dialect.type_descriptor(db.Integer())
+
+    def process_bind_param(self, value, dialect):
+        codes = genre_codes(value or [])
+        if dialect.name == 'postgresql':
+            return codes
+        return sum(1 << code for code in codes)
+
+    def process_result_value(self, value, dialect):
+        if dialect.name == 'postgresql':
+            codes = set(value or [])
+        else:
+            codes = {code for code in GENRE_CODES.values() if (value or 0) & (1 << code)}
+        return [name for name, code in GENRE_CODES.items() if code in codes]
+
+
+class StateCode(TypeDecorator):
+    """ A State value ('NY') stored as the native enum `state` (Postgres),
+    loaded as the plain string. Raises ValueError for an unknown state.
+    """
+    # Alphabetical, so that ORDER BY state sorts as it did on strings
+    impl = db.Enum(*sorted(state.value for state in State), name='state')
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, State):
+            return value.value
+        return State(value.upper()).value
+
+    def process_result_value(self, value, dialect):
+        return value
+
+
+def deleted_index(table):
+    # Only the rows waiting to be purged
+    return db.Index(f'ix_{table}_deleted_at', 'deleted_at',
+                    postgresql_where=db.text('deleted_at IS NOT NULL'))
+
 
 class Venue(db.Model):
+    __table_args__ = (
+        trigram_index('venue', 'name'),
+        trigram_index('venue', 'city'),
+        nearest_index('venue', 'name'),
+        db.Index('ix_venue_city_state', 'city', 'state'),
+        db.Index('ix_venue_state', 'state'),
+        # genres @> / && ARRAY[...] (genre filters and facets)
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        deleted_index('venue'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(GenreSet, nullable=False, default=list)
     address = db.Column(db.String(120))
     city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    state = db.Column(StateCode)
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='venue', lazy='joined', cascade="all, delete")
+    # Denormalized, kept current by the show_counts triggers and show_counts.refresh()
+    # (show_counts.py creates the triggers with the show table)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # UTC, set on insert and update (by the ORM, and by a database trigger for plain SQL)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # UTC, set when deleted; hidden from then on and purged later (see deletion.py)
+    deleted_at = db.Column(db.DateTime)
+    # Shows are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one
+    shows = db.relationship('Show', backref='venue', lazy='select', cascade="all, delete", passive_deletes=True)
 
     def __repr__(self):
         return f'<Venue {self.name}>'
 
 
 class Artist(db.Model):
+    __table_args__ = (
+        trigram_index('artist', 'name'),
+        trigram_index('artist', 'city'),
+        nearest_index('artist', 'name'),
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_state', 'state'),
+        # genres @> / && ARRAY[...] (genre filters and facets)
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        deleted_index('artist'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(GenreSet, nullable=False, default=list)
     city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    state = db.Column(StateCode)
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='artist', lazy='joined', cascade="all, delete")
+    # Denormalized, kept current by the show_counts triggers and show_counts.refresh()
+    # (show_counts.py creates the triggers with the show table)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # UTC, set on insert and update (by the ORM, and by a database trigger for plain SQL)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # UTC, set when deleted; hidden from then on and purged later (see deletion.py)
+    deleted_at = db.Column(db.DateTime)
+    # Shows are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one
+    shows = db.relationship('Show', backref='artist', lazy='select', cascade="all, delete", passive_deletes=True)
 
     def __repr__(self):
         return f'<Artist {self.name}>'
 
 
 class Show(db.Model):
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    # UTC, set on insert and update (by the ORM, and by a database trigger for plain SQL)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f'<Show {self.artist_id}{self.venue_id}>'
+
+
+class VenueSummary(db.Model):
+    """ The show lists of a venue's page, precomputed by summaries.py. """
+    __tablename__ = 'venue_summary'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    # Next upcoming and most recent past shows, with the artist's card data
+    upcoming_shows = db.Column(db.JSON, nullable=False)
+    past_shows = db.Column(db.JSON, nullable=False)
+    # Number of upcoming and past shows when refreshed (the lists are capped at SUMMARY_SHOWS)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Start of the first upcoming show: once it has passed the lists are stale
+    next_show_at = db.Column(db.DateTime, index=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+class ArtistSummary(db.Model):
+    """ The show lists of an artist's page, precomputed by summaries.py. """
+    __tablename__ = 'artist_summary'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    # Next upcoming and most recent past shows, with the venue's card data
+    upcoming_shows = db.Column(db.JSON, nullable=False)
+    past_shows = db.Column(db.JSON, nullable=False)
+    # Number of upcoming and past shows when refreshed (the lists are capped at SUMMARY_SHOWS)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Start of the first upcoming show: once it has passed the lists are stale
+    next_show_at = db.Column(db.DateTime, index=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import tuple_, DateTime
+
+# Keyset (seek) pagination: a page is the rows that come after the key values of
+# the previous page's last row, passed along as an opaque ?cursor=.
+
+
+def page_args():
+    """ Keyset pagination arguments (?cursor=...&per_page=...) of the current request. """
+    per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+    return {
+        'cursor': request.args.get('cursor'),
+        'per_page': min(max(per_page, 1), current_app.config['MAX_PAGE_SIZE'])
+    }
+
+
+def encode_cursor(values):
+    """ Opaque, URL-safe cursor for the key values of the last row of a page. """
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, key_columns):
+    """ Key values from a cursor made by encode_cursor(). Raises ValueError on a
+    malformed cursor.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError('Wrong number of key values')
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for value, column in zip(values, key_columns)
+        ]
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def keyset_page(session, stmt, key_columns, cursor=None, per_page=50):
+    """ Rows of stmt that come after the cursor in key order, at most per_page of
+    them. Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        stmt = stmt.where(tuple_(*key_columns) > tuple_(*decode_cursor(cursor, key_columns)))
+    stmt = stmt.order_by(*key_columns).limit(per_page + 1)
+
+    rows = session.execute(stmt).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[column] for column in key_columns])
+    return rows, next_cursor
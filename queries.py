@@ -0,0 +1,101 @@
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import select, func
+
+from models import Venue, Artist, Show
+
+
+def venue_areas_query(now=None):
+    """ One row per venue with its upcoming show count, ordered so that
+    venues of the same city/state are adjacent:
+    (city, state, id, name, num_upcoming_shows)
+    """
+    now = now or datetime.now()
+    num_upcoming_shows = func.count(Show.id).filter(Show.start_time > now)
+    return (
+        select(
+            Venue.city,
+            Venue.state,
+            Venue.id,
+            Venue.name,
+            num_upcoming_shows.label('num_upcoming_shows')
+        )
+        .outerjoin(Show, Show.venue_id == Venue.id)
+        .group_by(Venue.id)
+        .order_by(Venue.state, Venue.city, Venue.id)
+    )
+
+
+def group_venue_areas(rows):
+    """ Lazily group the rows of venue_areas_query() into areas:
+    {"city", "state", "venues": iterator of rows}
+    """
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        yield {
+            "city": city,
+            "state": state,
+            "venues": venues
+        }
+
+
+def shows_query():
+    """ Every show with the venue and artist data its card needs. """
+    return (
+        select(
+            Show.id,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Show.start_time
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+    )
+
+
+# Keyset (seek) pagination keys
+SHOWS_KEY = (Show.start_time, Show.id)
+ARTISTS_KEY = (Artist.name, Artist.id)
+VENUES_KEY = (Venue.id,)
+
+
+def venues_query():
+    """ Every venue with its listing data. """
+    return select(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.address,
+        Venue.phone,
+        Venue.genres,
+        Venue.image_link,
+        Venue.facebook_link,
+        Venue.website,
+        Venue.seeking_talent,
+        Venue.seeking_description,
+        Venue.upcoming_show_count,
+        Venue.past_show_count
+    )
+
+
+def artists_query():
+    """ Every artist with its listing data. """
+    return select(
+        Artist.id,
+        Artist.name,
+        Artist.city,
+        Artist.state,
+        Artist.phone,
+        Artist.genres,
+        Artist.image_link,
+        Artist.facebook_link,
+        Artist.website,
+        Artist.seeking_venue,
+        Artist.seeking_description,
+        Artist.upcoming_show_count,
+        Artist.past_show_count
+    )
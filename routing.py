@@ -0,0 +1,102 @@
+import itertools
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session as user_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+# Read replica routing. SELECTs made while handling a GET (or a view marked
+# read_only) go to one of the REPLICA_URLS; everything else, including reads
+# outside a request (CLI commands), goes to the primary. A user who has just
+# written reads from the primary for READ_YOUR_WRITES_SECONDS so that they see
+# their own change even if the replicas lag behind.
+#
+# To try it locally, copy the SQLite database and point REPLICA_URLS at the copy:
+# pages then show the copy's data until you write something.
+
+READ_METHODS = ('GET', 'HEAD')
+PRIMARY_UNTIL = '_primary_until'
+
+_next_replica = itertools.count()
+
+
+def replica_binds(urls):
+    """ SQLALCHEMY_BINDS entries for a comma separated list of replica URLs. """
+    urls = [url.strip() for url in urls.split(',') if url.strip()]
+    return {f'replica_{i}': url for i, url in enumerate(urls)}
+
+
+def read_only(view):
+    """ Let a view that is not a GET (e.g. a search form POST) read from the replicas. """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def recently_wrote():
+    """ Whether the current user wrote within READ_YOUR_WRITES_SECONDS. """
+    return user_session.get(PRIMARY_UNTIL, 0) >= time.time()
+
+
+def _reads_from_replica():
+    if not has_request_context():
+        return False
+    if request.method not in READ_METHODS and not g.get('read_only'):
+        return False
+    return not recently_wrote()
+
+
+def _wrote():
+    # Without replicas every read already sees the write
+    if has_request_context() and current_app.config['REPLICA_URLS']:
+        user_session[PRIMARY_UNTIL] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def _checked_out(engine):
+    checkedout = getattr(engine.pool, 'checkedout', None)
+    return checkedout() if checkedout else 0
+
+
+class RoutingSession(Session):
+    """ Session that sends reads to a replica when the request allows it. A
+    transaction sticks to the replica it started on, for a consistent snapshot.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self._replica = None
+        event.listen(self, 'after_flush', self._after_flush)
+        event.listen(self, 'after_transaction_end', self._after_transaction_end)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and clause is not None:
+            if isinstance(clause, Select) and clause._for_update_arg is None and not self._flushing:
+                replica = self._pick_replica()
+                if replica is not None:
+                    return replica
+            elif clause.is_dml:
+                # Core INSERT/UPDATE/DELETE, which do not flush
+                _wrote()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _pick_replica(self):
+        if self._replica is None and _reads_from_replica():
+            replicas = [engine for key, engine in sorted(self._db.engines.items(), key=lambda item: str(item[0]))
+                        if key and key.startswith('replica_')]
+            if replicas:
+                if current_app.config['REPLICA_BALANCING'] == 'least_connections':
+                    self._replica = min(replicas, key=_checked_out)
+                else:
+                    self._replica = replicas[next(_next_replica) % len(replicas)]
+        return self._replica
+
+    def _after_flush(self, session, flush_context):
+        _wrote()
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            self._replica = None
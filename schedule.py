@@ -0,0 +1,225 @@
+import calendar
+from datetime import datetime, time, timedelta, timezone
+from urllib.parse import urlsplit
+
+from sqlalchemy import Date, DateTime, cast, func, select
+
+from models import Venue, Artist, Show
+
+# Shows by date: the ?from= &to= &venue= &artist= &city= filters of /shows and
+# the API, the monthly calendar and the iCalendar feeds of venues and artists.
+#
+# A date range is a plain start_time >= from AND start_time < to, so that it
+# is answered from ix_show_start_time (or, with ?venue=/?artist=, from the
+# (venue_id, start_time)/(artist_id, start_time) indexes) rather than by
+# loading every show. A calendar month is one aggregate over that range,
+# grouped by date_trunc('day', start_time) on Postgres (date(start_time)
+# elsewhere, e.g. SQLite): one row per day that has shows.
+
+# Shows an .ics feed reads from the database at a time
+ICS_BATCH_SIZE = 500
+
+
+def parse_when(value):
+    """ datetime of an ISO 8601 date or datetime (a date is its midnight). """
+    return datetime.fromisoformat(value)
+
+
+def parse_month(value):
+    """ First day of a YYYY-MM month. """
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def format_when(value):
+    """ The inverse of parse_when(): a plain date at midnight. """
+    return value.date().isoformat() if value.time() == time.min else value.isoformat()
+
+
+def _id(value):
+    return int(value) if value else None
+
+
+def next_month(first):
+    return (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class ShowFilters:
+    """ The date range, venue, artist and city filters of a request. to is
+    exclusive: ?from=2026-10-01&to=2026-11-01 is October.
+    """
+
+    def __init__(self, start=None, end=None, venue_id=None, artist_id=None, city=None):
+        self.start = start
+        self.end = end
+        self.venue_id = venue_id
+        self.artist_id = artist_id
+        self.city = city or None
+
+    @classmethod
+    def from_args(cls, args):
+        """ Filters of request.args. Raises ValueError for a malformed date or id. """
+        start, end = args.get('from'), args.get('to')
+        return cls(
+            parse_when(start) if start else None,
+            parse_when(end) if end else None,
+            _id(args.get('venue')),
+            _id(args.get('artist')),
+            args.get('city', '').strip()
+        )
+
+    def __bool__(self):
+        return bool(self.items())
+
+    def items(self):
+        """ (name, value) pairs of the filters, e.g. for hidden form fields. """
+        pairs = []
+        if self.start:
+            pairs.append(('from', format_when(self.start)))
+        if self.end:
+            pairs.append(('to', format_when(self.end)))
+        if self.venue_id:
+            pairs.append(('venue', self.venue_id))
+        if self.artist_id:
+            pairs.append(('artist', self.artist_id))
+        if self.city:
+            pairs.append(('city', self.city))
+        return pairs
+
+    def conditions(self):
+        """ WHERE conditions on a statement that joins Show to its Venue. """
+        where = []
+        if self.start:
+            where.append(Show.start_time >= self.start)
+        if self.end:
+            where.append(Show.start_time < self.end)
+        if self.venue_id:
+            where.append(Show.venue_id == self.venue_id)
+        if self.artist_id:
+            where.append(Show.artist_id == self.artist_id)
+        if self.city:
+            where.append(Venue.city == self.city)
+        return where
+
+    def day(self, day):
+        """ These filters' venue, artist and city on the date day. """
+        start = datetime.combine(day, time.min)
+        return ShowFilters(start, start + timedelta(days=1), self.venue_id, self.artist_id, self.city)
+
+    def month(self, first):
+        """ These filters narrowed to the month starting on first. """
+        start, end = datetime.combine(first, time.min), datetime.combine(next_month(first), time.min)
+        return ShowFilters(
+            max(start, self.start) if self.start else start,
+            min(end, self.end) if self.end else end,
+            self.venue_id, self.artist_id, self.city
+        )
+
+
+def _joined(stmt):
+    return stmt.join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+
+
+def _day(dialect_name):
+    if dialect_name == 'postgresql':
+        return cast(func.date_trunc('day', Show.start_time, type_=DateTime), Date)
+    return func.date(Show.start_time, type_=Date)
+
+
+def day_counts_query(filters, dialect_name='postgresql'):
+    """ (day, shows): the number of shows per day under filters, for the days
+    that have any. One index range scan and one aggregate; no show is loaded.
+    """
+    day = _day(dialect_name).label('day')
+    return (
+        _joined(select(day, func.count(Show.id).label('shows')).select_from(Show))
+        .where(*filters.conditions())
+        .group_by(day)
+    )
+
+
+def month_calendar(session, first, filters, firstweekday=calendar.SUNDAY):
+    """ The month starting on first as a list of weeks, each a list of
+    {date, in_month, shows} days (the days of the adjacent months that fill
+    the first and last week are counted as 0).
+    """
+    stmt = day_counts_query(filters.month(first), session.get_bind().dialect.name)
+    counts = {row.day: row.shows for row in session.execute(stmt)}
+    return [
+        [{'date': day, 'in_month': day.month == first.month, 'shows': counts.get(day, 0) if day.month == first.month else 0}
+         for day in week]
+        for week in calendar.Calendar(firstweekday).monthdatescalendar(first.year, first.month)
+    ]
+
+
+def ics_query(filters):
+    """ The shows under filters with what their calendar events show, by time. """
+    return (
+        _joined(select(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Venue.address,
+            Venue.city,
+            Venue.state,
+            Show.artist_id,
+            Artist.name.label('artist_name')
+        ))
+        .where(*filters.conditions())
+        .order_by(Show.start_time, Show.id)
+        .execution_options(yield_per=ICS_BATCH_SIZE)
+    )
+
+
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    # A content line of at most 75 octets, continued on lines starting with a
+    # space (RFC 5545 3.1), never cut inside a UTF-8 character
+    data = line.encode('utf-8')
+    lines, limit = [], 75
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        lines.append(data[:cut])
+        data, limit = data[cut:], 74
+    lines.append(data)
+    return b'\r\n '.join(lines) + b'\r\n'
+
+
+def _event(row, stamp, base_url, host):
+    # Show times are local to the venue: floating DTSTART, no time zone
+    location = ', '.join(str(part) for part in (row.address, row.city, row.state) if part)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:show-{row.id}@{host}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{row.start_time:%Y%m%dT%H%M%S}',
+        f'SUMMARY:{_escape(row.artist_name)} at {_escape(row.venue_name)}',
+        f'LOCATION:{_escape(location)}',
+        f'URL:{base_url}artists/{row.artist_id}',
+        'END:VEVENT',
+    ]
+    return b''.join(_fold(line) for line in lines)
+
+
+def ics(rows, name, base_url, now=None):
+    """ An iCalendar named name of the rows of ics_query(), as chunks of bytes
+    (one per event), so that a feed is streamed as it is read.
+    """
+    stamp = (now or datetime.now(timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+    host = urlsplit(base_url).hostname
+    yield b''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Fyyur//Shows//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ))
+    for row in rows:
+        yield _event(row, stamp, base_url, host)
+    yield _fold('END:VCALENDAR')
@@ -0,0 +1,174 @@
+import threading
+
+from sqlalchemy import Float, event, select, func, and_, or_, true
+
+from enums import State
+from models import Venue, Artist
+
+# Venue/artist search: the term anywhere in the name or city, or exactly the
+# state.
+#
+# On Postgres a name within trigram similarity of the term (%) matches too,
+# and results come nearest name first (<->), which the GiST trigram index on
+# name returns in order: a page reads about LIMIT rows however many match.
+# The total is counted up to max_count + 1 only, for the same reason.
+#
+# Other databases (SQLite in the tests and in development) have no pg_trgm:
+# there an in-process inverted index of the names and cities' trigrams finds
+# the matching ids, kept current from the committed changes (see
+# refresh_changes) and dropped with its table.
+
+# Search results counted at most (the count reads "1000+" beyond)
+MAX_COUNT = 1000
+
+
+def _like_pattern(term):
+    # Escape LIKE wildcards so the term is matched literally
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{term}%"
+
+
+def search_condition(model, term):
+    """ Match the term anywhere in the name or city, or exactly on the state.
+    On Postgres the ILIKEs are served by the pg_trgm GIN indexes.
+    """
+    pattern = _like_pattern(term)
+    conditions = [
+        model.name.ilike(pattern, escape='\\'),
+        model.city.ilike(pattern, escape='\\'),
+    ]
+    # state is an enum: only a state code can be compared with it
+    if term.upper() in State.__members__:
+        conditions.append(model.state == term.upper())
+    return or_(*conditions)
+
+
+def ranking(model, term, dialect_name):
+    """ Nearest trigram matches on the name first (Postgres), then alphabetical. """
+    if dialect_name == 'postgresql' and term:
+        return (model.name.op('<->', return_type=Float)(term), model.id)
+    return (model.name, model.id)
+
+
+def _trigrams(text):
+    text = f'  {text.lower()} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class InvertedIndex:
+    """ Trigrams of the names and cities of one model -> ids, for databases
+    without pg_trgm. Loaded on first use.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._rows = None  # id -> (name, city, state), lower-cased
+        self._postings = {}  # trigram -> ids
+        self._lock = threading.Lock()
+
+    def _add(self, id, name, city, state):
+        row = ((name or '').lower(), (city or '').lower(), state)
+        self._rows[id] = row
+        for trigram in _trigrams(row[0]) | _trigrams(row[1]):
+            self._postings.setdefault(trigram, set()).add(id)
+
+    def _remove(self, id):
+        row = self._rows.pop(id, None)
+        if row is not None:
+            for trigram in _trigrams(row[0]) | _trigrams(row[1]):
+                self._postings[trigram].discard(id)
+
+    def _select(self):
+        model = self.model
+        return select(model.id, model.name, model.city, model.state).where(model.deleted_at.is_(None))
+
+    def _load(self, connection):
+        self._rows, self._postings = {}, {}
+        for row in connection.execute(self._select()):
+            self._add(*row)
+
+    def refresh(self, connection, ids):
+        """ Re-read the rows of ids (dropping deleted ones), if loaded. """
+        with self._lock:
+            if self._rows is None or not ids:
+                return
+            for id in ids:
+                self._remove(id)
+            for row in connection.execute(self._select().where(self.model.id.in_(ids))):
+                self._add(*row)
+
+    def clear(self):
+        with self._lock:
+            self._rows, self._postings = None, {}
+
+    def match(self, connection, term):
+        """ Ids whose name or city contains term, or whose state is term. """
+        with self._lock:
+            if self._rows is None:
+                self._load(connection)
+            needle = term.lower()
+            # A term of 3 or more characters is in the rows that have all of its
+            # inner trigrams (not the padded ones: it may start or end mid-word)
+            if len(needle) >= 3:
+                trigrams = {needle[i:i + 3] for i in range(len(needle) - 2)}
+                candidates = set.intersection(*(self._postings.get(trigram, set()) for trigram in trigrams))
+            else:
+                candidates = self._rows.keys()
+            ids = {id for id in candidates if needle in self._rows[id][0] or needle in self._rows[id][1]}
+            if term.upper() in State.__members__:
+                ids.update(id for id, row in self._rows.items() if row[2] == term.upper())
+            return ids
+
+
+INDEXES = {Venue: InvertedIndex(Venue), Artist: InvertedIndex(Artist)}
+
+# Tables dropped (and recreated, e.g. between tests) start over with new ids
+for _model, _index in INDEXES.items():
+    event.listen(_model.__table__, 'after_drop', lambda target, connection, _index=_index, **kw: _index.clear())
+
+
+def refresh_changes(connection, changes):
+    """ Bring the inverted indexes up to date with a changes.ChangeSet. """
+    INDEXES[Venue].refresh(connection, changes.venues)
+    INDEXES[Artist].refresh(connection, changes.artists)
+
+
+def matches(session, model, term):
+    """ The search condition of term on model for the session's database. """
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        return or_(search_condition(model, term), model.name.op('%')(term)) if term else true()
+    if not term:
+        return true()
+    return model.id.in_(INDEXES[model].match(session.connection(), term))
+
+
+def count_label(total, max_count=MAX_COUNT):
+    """ The number of results to show for a total counted by search(). """
+    return f'{max_count}+' if total > max_count else total
+
+
+def search(session, model, term, page=1, per_page=20, options=(), where=(), max_count=MAX_COUNT):
+    """ Return (total number of matches, up to max_count + 1, and the matches
+    on the requested page). where adds conditions (e.g. the
+    filters.conditions() of a request).
+    """
+    page = max(page, 1)
+    condition = and_(matches(session, model, term), *where)
+
+    total = session.scalar(
+        select(func.count()).select_from(select(model.id).where(condition).limit(max_count + 1).subquery())
+    )
+    if not total:
+        return 0, []
+
+    dialect_name = session.get_bind().dialect.name
+    stmt = (
+        select(model)
+        .options(*options)
+        .where(condition)
+        .order_by(*ranking(model, term, dialect_name))
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    )
+    return total, session.scalars(stmt).all()
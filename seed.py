@@ -0,0 +1,149 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, func
+
+import changes
+import show_counts
+from enums import Genre, State
+from models import Venue, Artist, Show
+
+# Synthetic data for load tests and benchmarks. Popularity is skewed the way
+# real listings are: a few big cities hold most venues and artists, a few genres
+# dominate, and a few venues/artists play most of the shows. The same seed
+# always produces the same data.
+
+# (city, state) of the busiest music cities; the rest get a random state
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Nashville', 'TN'),
+    ('Austin', 'TX'), ('San Francisco', 'CA'), ('Seattle', 'WA'), ('New Orleans', 'LA'),
+    ('Atlanta', 'GA'), ('Denver', 'CO'), ('Portland', 'OR'), ('Boston', 'MA'),
+    ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Miami', 'FL'),
+]
+OTHER_CITIES = ['Springfield', 'Franklin', 'Greenville', 'Madison', 'Clinton', 'Salem', 'Fairview', 'Georgetown']
+
+WORDS = ['Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Wild', 'Neon', 'Lonely',
+         'Broken', 'Crimson', 'Hollow', 'Lucky', 'Rusty', 'Secret', 'Thunder', 'Paper', 'Echo']
+VENUE_NOUNS = ['Hall', 'Room', 'Lounge', 'Tavern', 'Club', 'Theatre', 'Ballroom', 'Cellar', 'Garden']
+ARTIST_NOUNS = ['Wolves', 'Riders', 'Saints', 'Collective', 'Quartet', 'Brothers', 'Kids', 'Machine', 'Orchestra']
+
+# Shows spread over the last year and the next six months
+PAST_DAYS = 365
+UPCOMING_DAYS = 180
+
+
+def zipf_weights(n, s=1.1):
+    """ Weight of the k-th most popular of n items. """
+    return [1 / (k ** s) for k in range(1, n + 1)]
+
+
+class Generator:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.genres = [genre.name for genre in Genre]
+        self.rng.shuffle(self.genres)
+        self.genre_weights = zipf_weights(len(self.genres))
+        self.states = [state.value for state in State]
+        self.city_weights = zipf_weights(len(CITIES)) + [0.5]  # last: anywhere else
+
+    def area(self):
+        index = self.rng.choices(range(len(CITIES) + 1), self.city_weights)[0]
+        if index < len(CITIES):
+            return CITIES[index]
+        return self.rng.choice(OTHER_CITIES), self.rng.choice(self.states)
+
+    def pick_genres(self):
+        count = self.rng.choices((1, 2, 3), (6, 3, 1))[0]
+        return sorted(set(self.rng.choices(self.genres, self.genre_weights, k=count)))
+
+    def name(self, nouns, number):
+        return f"The {self.rng.choice(WORDS)} {self.rng.choice(nouns)} {number}"
+
+    def phone(self):
+        return f"{self.rng.randint(200, 999)}-{self.rng.randint(200, 999)}-{self.rng.randint(1000, 9999)}"
+
+    def venue(self, number):
+        city, state = self.area()
+        seeking = self.rng.random() < 0.3
+        return {
+            'name': self.name(VENUE_NOUNS, number),
+            'city': city,
+            'state': state,
+            'address': f"{self.rng.randint(1, 9999)} {self.rng.choice(WORDS)} Street",
+            'phone': self.phone(),
+            'genres': self.pick_genres(),
+            'image_link': f"https://picsum.photos/seed/venue{number}/400/300",
+            'facebook_link': f"https://www.facebook.com/venue{number}",
+            'website': f"https://venue{number}.example.com",
+            'seeking_talent': seeking,
+            'seeking_description': 'Looking for local acts on weekends.' if seeking else None,
+        }
+
+    def artist(self, number):
+        city, state = self.area()
+        seeking = self.rng.random() < 0.4
+        return {
+            'name': self.name(ARTIST_NOUNS, number),
+            'city': city,
+            'state': state,
+            'phone': self.phone(),
+            'genres': self.pick_genres(),
+            'image_link': f"https://picsum.photos/seed/artist{number}/300/400",
+            'facebook_link': f"https://www.facebook.com/artist{number}",
+            'website': f"https://artist{number}.example.com",
+            'seeking_venue': seeking,
+            'seeking_description': 'Touring the area and looking for gigs.' if seeking else None,
+        }
+
+    def show(self, venue_ids, venue_weights, artist_ids, artist_weights, now):
+        start = now + timedelta(days=self.rng.uniform(-PAST_DAYS, UPCOMING_DAYS))
+        return {
+            'venue_id': self.rng.choices(venue_ids, venue_weights)[0],
+            'artist_id': self.rng.choices(artist_ids, artist_weights)[0],
+            # Shows start on the hour, in the evening
+            'start_time': start.replace(hour=self.rng.randint(18, 23), minute=0, second=0, microsecond=0),
+        }
+
+
+def _insert(session, model, rows):
+    table = model.__table__
+    return session.execute(insert(table).returning(table.c.id), rows).scalars().all()
+
+
+def _batches(make, count, batch_size):
+    for start in range(0, count, batch_size):
+        yield [make(number) for number in range(start + 1, min(start + batch_size, count) + 1)]
+
+
+def seed(session, venues=100, artists=200, shows=1000, seed=0, batch_size=1000):
+    """ Insert synthetic venues, artists and shows (on top of existing rows) and
+    refresh the show counts. Returns the number of rows written per table.
+    """
+    generator = Generator(seed)
+    now = datetime.now()
+    offset = {
+        model: session.scalar(select(func.count()).select_from(model))
+        for model in (Venue, Artist)
+    }
+
+    venue_ids, artist_ids = [], []
+    for batch in _batches(lambda n: generator.venue(offset[Venue] + n), venues, batch_size):
+        venue_ids += _insert(session, Venue, batch)
+        session.commit()
+    for batch in _batches(lambda n: generator.artist(offset[Artist] + n), artists, batch_size):
+        artist_ids += _insert(session, Artist, batch)
+        session.commit()
+
+    written = 0
+    if shows and venue_ids and artist_ids:
+        venue_weights = zipf_weights(len(venue_ids), 0.8)
+        artist_weights = zipf_weights(len(artist_ids), 0.8)
+        for batch in _batches(lambda n: generator.show(venue_ids, venue_weights, artist_ids, artist_weights, now),
+                              shows, batch_size):
+            written += len(_insert(session, Show, batch))
+            session.commit()
+
+    # Core inserts bypass the ORM: refresh the counts and tell the subscribers
+    changes.mark(session, venues=venue_ids, artists=artist_ids)
+    show_counts.refresh(session)
+    return {'venues': len(venue_ids), 'artists': len(artist_ids), 'shows': written}
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+from sqlalchemy import DDL, event, select, update, func, exists, or_
+
+from models import Venue, Artist, Show
+
+# Venue/Artist carry denormalized upcoming_show_count/past_show_count columns.
+# Database triggers on show recount them, exactly, for every venue and artist
+# a statement's shows belong (or belonged) to, and bump their updated_at. A
+# count only goes stale when a show starts: refresh() moves started shows
+# from the upcoming to the past counts, so schedule `flask refresh-show-counts`.
+#
+# The migrations create the Postgres triggers; create_all() (tests, a fresh
+# development database) creates the same ones, or row-level ones on SQLite.
+
+FOREIGN_KEYS = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+
+def upcoming_show_count(model, now):
+    """ Correlated subquery counting the upcoming shows of each model row. """
+    return (
+        select(func.count(Show.id))
+        .where(FOREIGN_KEYS[model] == model.id, Show.start_time > now)
+        .scalar_subquery()
+    )
+
+
+def past_show_count(model, now):
+    """ Correlated subquery counting the past shows of each model row. """
+    return (
+        select(func.count(Show.id))
+        .where(FOREIGN_KEYS[model] == model.id, Show.start_time <= now)
+        .scalar_subquery()
+    )
+
+
+def refresh_statement(model, now, since=None):
+    """ UPDATE recomputing the counts of model. With `since`, only rows that
+    had a show start between `since` and `now` are touched.
+    """
+    upcoming = upcoming_show_count(model, now)
+    past = past_show_count(model, now)
+    # Leave rows whose counts are unchanged alone (keeps their updated_at/ETag)
+    stmt = (
+        update(model)
+        .values(upcoming_show_count=upcoming, past_show_count=past)
+        .where(or_(model.upcoming_show_count != upcoming, model.past_show_count != past))
+    )
+    if since is not None:
+        stmt = stmt.where(exists().where(
+            FOREIGN_KEYS[model] == model.id,
+            Show.start_time > since,
+            Show.start_time <= now
+        ))
+    return stmt.execution_options(synchronize_session=False)
+
+
+def refresh(session, window=None):
+    """ Recompute the denormalized show counts and return the number of rows
+    updated. `window` is a timedelta; when given, only venues and artists with a
+    show that started within it are refreshed (run the job at least that often).
+    """
+    now = datetime.now()
+    since = now - window if window is not None else None
+    updated = 0
+    for model in (Venue, Artist):
+        updated += session.execute(refresh_statement(model, now, since)).rowcount
+    session.commit()
+    return updated
+
+
+# Postgres: one statement-level trigger per event (transition tables need a
+# single event and no column list). Only shows whose venue, artist or start
+# time changed count as updated.
+CHANGED_SHOWS = {
+    'insert': "SELECT venue_id, artist_id FROM new_shows",
+    'update': """SELECT moved.venue_id, moved.artist_id
+                 FROM old_shows o JOIN new_shows n ON n.id = o.id,
+                      LATERAL (VALUES (o.venue_id, o.artist_id), (n.venue_id, n.artist_id)) AS moved (venue_id, artist_id)
+                 WHERE (o.venue_id, o.artist_id, o.start_time) IS DISTINCT FROM (n.venue_id, n.artist_id, n.start_time)""",
+    'delete': "SELECT venue_id, artist_id FROM old_shows",
+}
+
+TRANSITION_TABLES = {
+    'insert': 'NEW TABLE AS new_shows',
+    'update': 'OLD TABLE AS old_shows NEW TABLE AS new_shows',
+    'delete': 'OLD TABLE AS old_shows',
+}
+
+
+def _recount(table, column, ids, now, touched):
+    return f"""
+        UPDATE {table} SET
+            upcoming_show_count = (SELECT count(*) FROM show WHERE show.{column} = {table}.id AND show.start_time > {now}),
+            past_show_count = (SELECT count(*) FROM show WHERE show.{column} = {table}.id AND show.start_time <= {now}),
+            updated_at = {touched}
+        WHERE {table}.id IN ({ids});"""
+
+
+def postgresql_triggers():
+    """ Statements creating the show count functions and triggers on Postgres. """
+    # start_time is stored without time zone, so compare against LOCALTIMESTAMP
+    statements = []
+    for event_name, changed in CHANGED_SHOWS.items():
+        statements.append(f"""
+    CREATE OR REPLACE FUNCTION show_counts_{event_name}() RETURNS trigger AS $$
+    BEGIN{_recount('venue', 'venue_id', f'SELECT venue_id FROM ({changed}) AS changed', 'LOCALTIMESTAMP', "timezone('utc', now())")}{_recount('artist', 'artist_id', f'SELECT artist_id FROM ({changed}) AS changed', 'LOCALTIMESTAMP', "timezone('utc', now())")}
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""")
+        statements.append(f"""
+    CREATE TRIGGER show_counts_{event_name}
+    AFTER {event_name.upper()} ON show
+    REFERENCING {TRANSITION_TABLES[event_name]}
+    FOR EACH STATEMENT EXECUTE FUNCTION show_counts_{event_name}()""")
+    return statements
+
+
+def sqlite_triggers():
+    """ Statements creating row-level show count triggers on SQLite. """
+    rows = {
+        'INSERT': ('NEW.venue_id', 'NEW.artist_id'),
+        'UPDATE OF venue_id, artist_id, start_time': ('OLD.venue_id, NEW.venue_id', 'OLD.artist_id, NEW.artist_id'),
+        'DELETE': ('OLD.venue_id', 'OLD.artist_id'),
+    }
+    now, touched = "datetime('now', 'localtime')", "datetime('now')"
+    return [f"""
+    CREATE TRIGGER show_counts_{event_name.split()[0].lower()} AFTER {event_name} ON show
+    BEGIN{_recount('venue', 'venue_id', venue_ids, now, touched)}{_recount('artist', 'artist_id', artist_ids, now, touched)}
+    END""" for event_name, (venue_ids, artist_ids) in rows.items()]
+
+
+for _statement in postgresql_triggers():
+    event.listen(Show.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in sqlite_triggers():
+    event.listen(Show.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
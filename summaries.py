@@ -0,0 +1,180 @@
+from datetime import datetime
+
+from sqlalchemy import select, case, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Venue, Artist, Show, VenueSummary, ArtistSummary
+
+# Precomputed show lists of the venue and artist pages (venue_summary and
+# artist_summary): the next upcoming and the most recent past shows, with the
+# other side's card data, so a detail page reads one row instead of every show.
+# Rows are refreshed when a commit changes them (see refresh_changes) and on a
+# schedule for lists whose first upcoming show has started (flask refresh-summaries).
+# Each row also holds the number of upcoming and past shows, counted by the
+# query that ranks the lists, so that a page's counts always match its lists.
+
+BATCH_SIZE = 1000
+
+# model -> (summary model, its key, show column of the model, other model, show column of the other, prefix)
+SIDES = {
+    Venue: (VenueSummary, VenueSummary.venue_id, Show.venue_id, Artist, Show.artist_id, 'artist'),
+    Artist: (ArtistSummary, ArtistSummary.artist_id, Show.artist_id, Venue, Show.venue_id, 'venue'),
+}
+
+
+def shows_statement(model, ids, limit, now):
+    """ The first `limit` upcoming and past shows of each venue (or artist) in
+    ids, ranked per side: upcoming soonest first, past most recent first, each
+    with the number of shows on its side.
+    """
+    summary, key, show_key, other, other_key, prefix = SIDES[model]
+    upcoming = Show.start_time > now
+    rank = func.row_number().over(
+        partition_by=(show_key, upcoming),
+        # Upcoming shows rank by the first key; in the past partition it is NULL
+        order_by=(case((upcoming, Show.start_time)).asc(), Show.start_time.desc())
+    )
+    shows = func.count().over(partition_by=(show_key, upcoming))
+    ranked = (
+        select(
+            show_key.label('owner_id'),
+            upcoming.label('upcoming'),
+            other.id.label('other_id'),
+            other.name.label('other_name'),
+            other.image_link.label('other_image_link'),
+            Show.start_time,
+            rank.label('rank'),
+            shows.label('shows')
+        )
+        .join(other, other_key == other.id)
+        .where(show_key.in_(ids), other.deleted_at.is_(None))
+        .subquery()
+    )
+    return select(ranked).where(ranked.c.rank <= limit).order_by(ranked.c.owner_id, ranked.c.rank)
+
+
+def build(connection, model, ids, limit, now=None):
+    """ Summary rows, by id, of the venues (or artists) in ids that exist and
+    are not deleted.
+    connection may be a Connection or a Session.
+    """
+    summary, key, show_key, other, other_key, prefix = SIDES[model]
+    now = now or datetime.now()
+    rows = {
+        id: {key.key: id, 'upcoming_shows': [], 'past_shows': [], 'upcoming_show_count': 0, 'past_show_count': 0,
+             'next_show_at': None, 'refreshed_at': now}
+        for id in connection.scalars(select(model.id).where(model.id.in_(ids), model.deleted_at.is_(None)))
+    }
+    for show in connection.execute(shows_statement(model, list(rows), limit, now)):
+        row = rows[show.owner_id]
+        row['upcoming_show_count' if show.upcoming else 'past_show_count'] = show.shows
+        row['upcoming_shows' if show.upcoming else 'past_shows'].append({
+            f'{prefix}_id': show.other_id,
+            f'{prefix}_name': show.other_name,
+            f'{prefix}_image_link': show.other_image_link,
+            'start_time': show.start_time.isoformat()
+        })
+        if show.upcoming and row['next_show_at'] is None:
+            row['next_show_at'] = show.start_time
+    return rows
+
+
+def _upsert(connection, summary, key):
+    table = summary.__table__
+    dialect = connection.dialect.name
+    stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[key.key],
+        set_={column.key: stmt.excluded[column.key] for column in table.columns if column.key != key.key}
+    )
+
+
+def refresh(connection, model, ids, limit, now=None):
+    """ Rewrite the summary rows of ids (deleting those whose venue/artist is
+    gone). Readers keep seeing the old rows until the transaction commits.
+    Returns the number of rows written.
+    """
+    summary, key = SIDES[model][:2]
+    ids = sorted(set(ids))
+    now = now or datetime.now()
+    written = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        rows = build(connection, model, batch, limit, now)
+        gone = set(batch) - rows.keys()
+        if gone:
+            connection.execute(summary.__table__.delete().where(key.in_(gone)))
+        if rows:
+            connection.execute(_upsert(connection, summary, key), list(rows.values()))
+        written += len(rows)
+    return written
+
+
+def refresh_changes(connection, changes, limit):
+    """ Refresh the summaries a changes.ChangeSet made stale. """
+    venue_ids = changes.venues | changes.show_venues
+    artist_ids = changes.artists | changes.show_artists
+    # Card data (name, image) is copied into the other side's summaries
+    if changes.artists:
+        venue_ids |= set(connection.scalars(
+            select(Show.venue_id).where(Show.artist_id.in_(changes.artists)).distinct()))
+    if changes.venues:
+        artist_ids |= set(connection.scalars(
+            select(Show.artist_id).where(Show.venue_id.in_(changes.venues)).distinct()))
+    return refresh(connection, Venue, venue_ids, limit) + refresh(connection, Artist, artist_ids, limit)
+
+
+def refresh_due(connection, model, limit, everything=False, now=None):
+    """ Refresh the summaries that are missing or whose first upcoming show
+    has started (or every summary). Returns the number of rows written.
+    """
+    summary, key = SIDES[model][:2]
+    now = now or datetime.now()
+    stmt = select(model.id).outerjoin(summary, key == model.id).where(model.deleted_at.is_(None))
+    if not everything:
+        stmt = stmt.where(or_(key.is_(None), summary.next_show_at <= now))
+    return refresh(connection, model, connection.scalars(stmt).all(), limit, now)
+
+
+def outrun(upcoming_shows, upcoming_show_count, now):
+    """ Whether a summary row can no longer tell its page's shows: every listed
+    upcoming show has started, and unlisted ones may have too.
+    """
+    return (upcoming_show_count > len(upcoming_shows)
+            and all(datetime.fromisoformat(show['start_time']) <= now for show in upcoming_shows))
+
+
+def started(upcoming_shows, now):
+    """ The number of listed upcoming shows that have started by now. """
+    return sum(1 for show in upcoming_shows if datetime.fromisoformat(show['start_time']) <= now)
+
+
+def page_shows(session, model, id, summary, limit, now=None):
+    """ The upcoming_shows, past_shows, upcoming_shows_count and
+    past_shows_count of a detail page from its summary row, built on the fly
+    when the row does not exist yet. Shows that started since the last
+    refresh move to the past list and count.
+    """
+    now = now or datetime.now()
+    if summary is None or outrun(summary.upcoming_shows, summary.upcoming_show_count, now):
+        row = build(session, model, [id], limit, now).get(id)
+        if row is None:
+            return {'upcoming_shows': [], 'past_shows': [], 'upcoming_shows_count': 0, 'past_shows_count': 0}
+    else:
+        row = {column: getattr(summary, column)
+               for column in ('upcoming_shows', 'past_shows', 'upcoming_show_count', 'past_show_count')}
+
+    # The rows hold ISO strings; the templates get datetimes
+    upcoming = [dict(show, start_time=datetime.fromisoformat(show['start_time'])) for show in row['upcoming_shows']]
+    past = [dict(show, start_time=datetime.fromisoformat(show['start_time'])) for show in row['past_shows']]
+
+    started = [show for show in upcoming if show['start_time'] <= now]
+    if started:
+        upcoming = upcoming[len(started):]
+        past = (started[::-1] + past)[:limit]
+    return {
+        'upcoming_shows': upcoming,
+        'past_shows': past,
+        'upcoming_shows_count': row['upcoming_show_count'] - len(started),
+        'past_shows_count': row['past_show_count'] + len(started),
+    }
@@ -0,0 +1,83 @@
+import os
+
+from flask import request, url_for
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# Template loading and fragment caching.
+# - TEMPLATE_BYTECODE_CACHE_DIR: compiled templates are kept on disk, so a new
+#   worker (or a restart) does not recompile them.
+# - TEMPLATE_PRECOMPILE: every template is compiled at startup, before the first
+#   request (in the gunicorn master with preload_app, shared by the workers),
+#   once every filter is registered.
+# - {% cache %}: a fragment of a page is stored in the page cache backend and
+#   dropped with the same tags as the pages, e.g.
+#     {% cache 'artist-card', show.artist_id, show.start_time tags ['artist:' ~ show.artist_id] %}
+#       ...
+#     {% endcache %}
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        tags = nodes.List([])
+        if parser.stream.skip_if('name:tags'):
+            tags = parser.parse_expression()
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', [nodes.List(key), tags]), [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, tags, caller):
+        backend = self.environment.fragment_cache
+        if backend is None:
+            return caller()
+        key = 'fragment:' + ':'.join(str(part) for part in key)
+        value = backend.get(key)
+        if value is None:
+            value = caller()
+            backend.set(key, str(value), tags)
+        return Markup(value)
+
+
+def url_with(**args):
+    """ URL of the current page with some query arguments replaced (None drops
+    one); the others, e.g. filters, are kept.
+    """
+    query = request.args.to_dict(flat=False)
+    for name, value in args.items():
+        if value is None:
+            query.pop(name, None)
+        else:
+            query[name] = value
+    return url_for(request.endpoint, **request.view_args, **query)
+
+
+def precompile(app):
+    """ Compile (and load) every template. Returns how many there are. """
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def init_app(app, cache_backend):
+    """ Set up the bytecode cache, fragment caching in cache_backend and the
+    template helpers.
+    """
+    cache_dir = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache_backend
+    app.jinja_env.globals['url_with'] = url_with
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# app.py reads its config on import: the testing profile, on a throwaway SQLite
+# database unless TEST_DATABASE_URL points at a Postgres one.
+os.environ.setdefault('FYYUR_ENV', 'testing')
+os.environ.setdefault('TEST_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur_test.db'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as fyyur_app, db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with fyyur_app.app_context():
+        db.create_all()
+        yield fyyur_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """ The SQL statements run (on any engine) while the test runs. """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    for engine in engines:
+        event.remove(engine, 'before_cursor_execute', record)
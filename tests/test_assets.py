@@ -0,0 +1,29 @@
+import posixpath
+import re
+
+import assets
+
+URL = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+
+
+def _urls(css):
+    return [url for quote, url in URL.findall(css) if not url.startswith(('data:', '#'))]
+
+
+def test_css_bundle_urls_point_where_the_sources_do(app):
+    # Bundles are served from /assets, not next to their sources: every url()
+    # must be the absolute /static URL its source stylesheet resolved to
+    sources = assets.BUNDLES['css/site.css']
+    expected = set()
+    for source in sources:
+        with open(f'{app.static_folder}/{source}', encoding='utf-8') as f:
+            for url in _urls(f.read()):
+                if url.startswith(('/', 'http:', 'https:')):
+                    expected.add(url)
+                else:
+                    expected.add(posixpath.normpath(f'{app.static_url_path}/{posixpath.dirname(source)}/{url}'))
+
+    css = assets.bundle(app.static_folder, 'css/site.css', sources, app.static_url_path).decode()
+
+    assert expected and set(_urls(css)) == expected
+    assert f'{app.static_url_path}/fonts/glyphicons-halflings-regular.woff' in expected
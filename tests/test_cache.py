@@ -0,0 +1,42 @@
+import pytest
+
+import app as fyyur
+from cache import LRUCache
+from models import db, Venue
+
+
+@pytest.fixture
+def response_cache(app, monkeypatch):
+    """ A memory page cache instead of the testing profile's null one. """
+    monkeypatch.setattr(fyyur.response_cache, 'backend', LRUCache())
+    return fyyur.response_cache.backend
+
+
+def add_venue():
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+    db.session.commit()
+
+
+def test_pages_are_cached(app, response_cache):
+    add_venue()
+    assert app.test_client().get('/venues').headers['X-Cache'] == 'MISS'
+    response = app.test_client().get('/venues')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert b'The Musical Hop' in response.data
+
+
+def test_pages_that_flash_an_error_are_not_cached(app, response_cache, monkeypatch):
+    add_venue()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('database is down')
+    monkeypatch.setattr(fyyur, 'venue_areas_query', fail)
+    response = app.test_client().get('/venues')
+    assert b'Unable to query venues in database' in response.data
+    assert 'X-Cache' not in response.headers
+
+    monkeypatch.undo()
+    monkeypatch.setattr(fyyur.response_cache, 'backend', response_cache)
+    response = app.test_client().get('/venues')
+    assert b'Unable to query venues in database' not in response.data
+    assert b'The Musical Hop' in response.data
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from models import db, Venue, Artist, Show, VenueSummary
+
+
+def add_venue_with_show():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock_n_Roll'])
+    db.session.add_all([venue, artist, Show(venue=venue, artist=artist, start_time=datetime.now() + timedelta(days=1))])
+    db.session.commit()
+    return venue, artist
+
+
+def test_revalidation_is_answered_from_one_row(client, queries):
+    venue, artist = add_venue_with_show()
+    response = client.get(f'/venues/{venue.id}')
+    etag = response.headers['ETag']
+    assert 'Last-Modified' not in response.headers
+
+    queries.clear()
+    response = client.get(f'/venues/{venue.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert len(queries) == 1
+
+
+def test_etag_changes_with_the_shows(client):
+    venue, artist = add_venue_with_show()
+    etag = client.get(f'/venues/{venue.id}').headers['ETag']
+
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=2)))
+    db.session.commit()
+    response = client.get(f'/venues/{venue.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_etag_changes_when_a_listed_show_starts(client):
+    venue, artist = add_venue_with_show()
+    etag = client.get(f'/venues/{venue.id}').headers['ETag']
+
+    # The summary still lists the show as upcoming, but it has started
+    db.session.execute(db.update(VenueSummary).values(upcoming_shows=[{
+        'artist_id': artist.id, 'artist_name': artist.name, 'artist_image_link': None,
+        'start_time': (datetime.now() - timedelta(minutes=1)).isoformat()
+    }]))
+    db.session.commit()
+    assert client.get(f'/venues/{venue.id}', headers={'If-None-Match': etag}).headers['ETag'] != etag
+
+
+def test_if_modified_since_alone_is_not_answered_with_304(client):
+    venue, artist = add_venue_with_show()
+    response = client.get(f'/venues/{venue.id}', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_pages_without_a_summary_row_are_not_validated(client):
+    venue, artist = add_venue_with_show()
+    db.session.execute(db.delete(VenueSummary))
+    db.session.commit()
+    response = client.get(f'/venues/{venue.id}')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
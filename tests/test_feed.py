@@ -0,0 +1,59 @@
+import feed
+from feed import Feed
+from models import db, Venue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def add_venue(name):
+    venue = Venue(name=name, city='San Francisco', state='CA', genres=['Jazz'])
+    db.session.add(venue)
+    db.session.commit()
+    return venue
+
+
+def names(entries):
+    return [entry['name'] for entry in entries]
+
+
+def test_memory_ring_sees_other_workers_venues_after_ttl(app, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(feed.time, 'monotonic', clock)
+    # A worker whose subscriber never hears of the other worker's writes
+    worker = Feed()
+    worker.ring = feed.create_ring({'FEED_TYPE': 'memory', 'FEED_SIZE': 10, 'FEED_TTL': 30})
+
+    add_venue('The Musical Hop')
+    assert names(worker.recent(db.session, 'venues')) == ['The Musical Hop']
+
+    add_venue('Park Square Live Music & Coffee')
+    clock.now += 29
+    assert names(worker.recent(db.session, 'venues')) == ['The Musical Hop']
+    clock.now += 2
+    assert names(worker.recent(db.session, 'venues')) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+
+
+def test_memory_ring_without_ttl_is_kept(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(feed.time, 'monotonic', clock)
+    ring = feed.MemoryRing(10)
+    ring.replace('venues', [{'id': 1, 'name': 'The Musical Hop'}])
+    clock.now += 10 ** 6
+    assert ring.get('venues') == [{'id': 1, 'name': 'The Musical Hop'}]
+
+
+def test_init_app_loads_the_rings(app, monkeypatch, queries):
+    add_venue('The Musical Hop')
+    monkeypatch.setitem(app.extensions, 'feed', app.extensions['feed'])
+    worker = Feed(app, db.engine)
+
+    queries.clear()
+    assert names(worker.recent(db.session, 'venues')) == ['The Musical Hop']
+    assert worker.recent(db.session, 'shows') == []
+    assert queries == []
@@ -0,0 +1,57 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from models import db, Venue
+
+
+def add_venue(name, genres):
+    db.session.add(Venue(name=name, city='San Francisco', state='CA', genres=genres))
+    db.session.commit()
+
+
+def names(condition):
+    return db.session.scalars(select(Venue.name).where(condition).order_by(Venue.name)).all()
+
+
+def test_genre_filters(app):
+    add_venue('The Musical Hop', ['Jazz', 'Reggae', 'Folk'])
+    add_venue('Park Square Live Music & Coffee', ['Rock n Roll', 'Jazz', 'Classical', 'Folk'])
+    add_venue('The Dueling Pianos Bar', ['Classical', 'R&B', 'Hip-Hop'])
+
+    assert names(Venue.genres.has_all(['Jazz', 'Folk'])) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+    assert names(Venue.genres.has_all(['Jazz', 'Classical'])) == ['Park Square Live Music & Coffee']
+    assert names(Venue.genres.has_any(['Reggae', 'Hip_Hop', 'Nope'])) == ['The Dueling Pianos Bar', 'The Musical Hop']
+    assert names(Venue.genres.has_all(['Nope'])) == []
+    assert db.session.scalar(select(Venue.genres).where(Venue.name == 'The Dueling Pianos Bar')) == \
+        ['Classical', 'Hip_Hop', 'R_and_B']
+
+
+def test_postgres_genre_filters_use_array_operators():
+    # The GIN index on genres answers @> and &&
+    dialect = postgresql.dialect()
+    assert str(Venue.genres.has_all(['Jazz', 'Blues']).compile(dialect=dialect)) == \
+        'venue.genres @> ARRAY[1, 10]::smallint[]'
+    assert str(Venue.genres.has_any(['Jazz']).compile(dialect=dialect)) == 'venue.genres && ARRAY[10]::smallint[]'
+
+
+def edit_form(**fields):
+    form = {'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+            'phone': '123-123-1234', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+    form.update(fields)
+    return form
+
+
+def test_edits_with_unknown_genres_or_states_are_rejected(client):
+    add_venue('The Musical Hop', ['Jazz'])
+    venue_id = db.session.scalar(select(Venue.id))
+
+    for fields in ({'genres': ['Jazz', 'Nope']}, {'state': 'XX'}):
+        response = client.post(f'/venues/{venue_id}/edit', data=edit_form(**fields))
+        assert response.status_code == 400
+        assert b'Please fix the following errors' in response.data
+
+    response = client.post(f'/venues/{venue_id}/edit', data=edit_form(genres=['Blues', 'Hip_Hop'], state='NY'))
+    assert response.status_code == 302
+    db.session.expire_all()
+    venue = db.session.get(Venue, venue_id)
+    assert (venue.genres, venue.state) == (['Blues', 'Hip_Hop'], 'NY')
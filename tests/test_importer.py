@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+import importer
+from models import db, Venue
+
+VENUE = {'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+         'phone': '123-123-1234', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def venues():
+    return db.session.execute(select(Venue.id, Venue.name).order_by(Venue.id)).all()
+
+
+def test_rows_are_written_in_input_order(app):
+    rows = [(1, {**VENUE, 'name': 'First'}), (2, {**VENUE, 'name': 'Second', 'id': 50}), (3, {**VENUE, 'name': 'Third'})]
+    report = importer.run(db.session, 'venues', rows)
+
+    assert report.written == 3 and not report.errors
+    assert [name for id, name in venues()] == ['First', 'Second', 'Third']
+
+
+def test_rows_with_an_id_update_that_row(app):
+    importer.run(db.session, 'venues', [(1, {**VENUE, 'name': 'Old name', 'id': 7})])
+    importer.run(db.session, 'venues', [(1, {**VENUE, 'name': 'New name', 'id': 7})])
+    assert [tuple(row) for row in venues()] == [(7, 'New name')]
+
+
+def test_import_endpoint_is_off_without_a_token(client):
+    response = client.post('/api/v1/import/venues', data=ndjson({**VENUE, 'name': 'x'}))
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('authorization', [None, 'Bearer wrong', 'secret'])
+def test_import_endpoint_needs_the_token(app, client, monkeypatch, authorization):
+    monkeypatch.setitem(app.config, 'IMPORT_API_TOKEN', 'secret')
+    headers = {'Authorization': authorization} if authorization else {}
+    response = client.post('/api/v1/import/venues', data=ndjson({**VENUE, 'name': 'x'}), headers=headers)
+    assert response.status_code == 401
+    assert venues() == []
+
+
+def test_import_endpoint(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMPORT_API_TOKEN', 'secret')
+    response = client.post('/api/v1/import/venues', data=ndjson({**VENUE, 'name': 'x'}, {'name': ''}),
+                           headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.json['written'] == 1 and response.json['failed'] == 1
+    assert [name for id, name in venues()] == ['x']
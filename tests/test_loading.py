@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from models import db, Venue, Artist, Show
+
+ERROR = b'An error occurred while processing your request.'
+
+
+def add_shows(count):
+    """ A venue and an artist with count shows, half of them upcoming. """
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock_n_Roll'])
+    now = datetime.now()
+    for i in range(count):
+        db.session.add(Show(venue=venue, artist=artist, start_time=now + timedelta(days=i - count // 2, hours=1)))
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    ids = venue.id, artist.id
+    db.session.expunge_all()
+    return ids
+
+
+def page_queries(client, queries, url):
+    queries.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert ERROR not in response.data
+    return len(queries)
+
+
+def test_unplanned_lazy_load_raises(app):
+    venue_id, _ = add_shows(2)
+    venue = db.session.scalar(select(Venue).where(Venue.id == venue_id))
+    with pytest.raises(InvalidRequestError, match='Unplanned lazy load'):
+        venue.shows
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+def test_detail_page_query_count_does_not_grow_with_shows(app, client, queries, kind):
+    venue_id, artist_id = add_shows(4)
+    url = f'/{kind}/{venue_id if kind == "venues" else artist_id}'
+    few = page_queries(client, queries, url)
+
+    db.session.add_all(Show(venue_id=venue_id, artist_id=artist_id, start_time=datetime.now() + timedelta(days=i))
+                       for i in range(-20, 20))
+    db.session.commit()
+    assert page_queries(client, queries, url) == few
+
+
+@pytest.mark.parametrize('url', ['/', '/artists', '/venues/{venue_id}/edit', '/artists/{artist_id}/edit'])
+def test_pages_plan_their_loads(app, client, url):
+    venue_id, artist_id = add_shows(4)
+    response = client.get(url.format(venue_id=venue_id, artist_id=artist_id))
+    assert response.status_code == 200
+    assert ERROR not in response.data
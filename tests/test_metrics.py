@@ -0,0 +1,44 @@
+import json
+import re
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import app as fyyur
+import metrics
+from models import db
+
+
+def count(body, endpoint):
+    match = re.search(rf'fyyur_request_duration_seconds_count{{endpoint="{endpoint}"}} (\d+)', body)
+    return int(match.group(1)) if match else 0
+
+
+def test_failed_statement_leaves_no_start_time(app):
+    with db.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM no_such_table'))
+        assert connection.info.get('query_start') == []
+
+
+def test_scrape_adds_up_every_worker(app, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(fyyur.metrics, 'directory', str(tmp_path))
+    other_worker = {'fyyur_request_duration_seconds': {'index': [0] * len(metrics.LATENCY_BUCKETS) + [0.5, 3]}}
+    (tmp_path / '99999.json').write_text(json.dumps(other_worker))
+
+    mine = count(client.get('/metrics').get_data(as_text=True), 'index')
+    client.get('/')
+    assert count(client.get('/metrics').get_data(as_text=True), 'index') == mine + 1
+    assert mine >= 3
+
+
+def test_retired_workers_are_kept(tmp_path):
+    series = {'fyyur_db_statements': {'index': [1] * len(metrics.COUNT_BUCKETS) + [2.0, 1]}}
+    for pid in (1, 2):
+        (tmp_path / f'{pid}.json').write_text(json.dumps(series))
+        metrics.retire(str(tmp_path), pid)
+
+    assert [path.name for path in tmp_path.iterdir()] == [metrics.RETIRED]
+    retired = json.loads((tmp_path / metrics.RETIRED).read_text())
+    assert retired['fyyur_db_statements']['index'][-2:] == [4.0, 2]
@@ -0,0 +1,82 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select
+
+from routing import RoutingSession, read_only, replica_binds
+
+metadata = MetaData()
+item = Table('item', metadata, Column('id', Integer, primary_key=True), Column('name', String))
+
+
+def database(path, name):
+    """ A SQLite file whose item table holds one row naming it. """
+    url = f'sqlite:///{path}'
+    engine = create_engine(url)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(item).values(name=name))
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """ A Flask app on a primary and two replicas, answering with the name of
+    the database its read went to.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=database(tmp_path / 'primary.db', 'primary'),
+        SQLALCHEMY_BINDS=replica_binds(','.join(
+            database(tmp_path / f'replica_{i}.db', f'replica_{i}') for i in range(2))),
+        REPLICA_URLS='configured',
+        REPLICA_BALANCING='round_robin',
+        READ_YOUR_WRITES_SECONDS=10,
+    )
+    db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+    def name():
+        return db.session.scalar(select(item.c.name).order_by(item.c.id))
+
+    @app.route('/read', methods=['GET', 'POST'])
+    def read():
+        return name()
+
+    @app.route('/search', methods=['POST'])
+    @read_only
+    def search():
+        return name()
+
+    @app.route('/write', methods=['POST'])
+    def write():
+        db.session.execute(insert(item).values(name='written'))
+        db.session.commit()
+        return name()
+
+    return app
+
+
+def test_gets_read_from_the_replicas_in_turn(routed):
+    client = routed.test_client()
+    names = {client.get('/read').text for _ in range(4)}
+    assert names == {'replica_0', 'replica_1'}
+
+
+def test_other_methods_read_from_the_primary(routed):
+    client = routed.test_client()
+    assert client.post('/read').text == 'primary'
+    assert client.post('/search').text.startswith('replica_')
+
+
+def test_reads_after_a_write_go_to_the_primary(routed):
+    writer, other = routed.test_client(), routed.test_client()
+    assert writer.post('/write').text == 'primary'
+    assert writer.get('/read').text == 'primary'
+    assert other.get('/read').text.startswith('replica_')
+
+
+def test_least_connections_balancing(routed):
+    routed.config['REPLICA_BALANCING'] = 'least_connections'
+    assert routed.test_client().get('/read').text.startswith('replica_')
@@ -0,0 +1,29 @@
+from datetime import date, datetime
+
+import schedule
+from models import db, Venue, Artist, Show
+
+
+def add_shows(*start_times):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock_n_Roll'])
+    db.session.add_all([venue, artist])
+    for start_time in start_times:
+        db.session.add(Show(venue=venue, artist=artist, start_time=start_time))
+    db.session.commit()
+
+
+def test_month_calendar_counts_shows_per_day(app):
+    add_shows(datetime(2026, 10, 3, 20), datetime(2026, 10, 3, 23, 30), datetime(2026, 10, 31, 21),
+              datetime(2026, 11, 1, 0, 30))
+    weeks = schedule.month_calendar(db.session, date(2026, 10, 1), schedule.ShowFilters())
+
+    counts = {day['date']: day['shows'] for week in weeks for day in week if day['shows']}
+    assert counts == {date(2026, 10, 3): 2, date(2026, 10, 31): 1}
+
+
+def test_calendar_page(client):
+    add_shows(datetime(2026, 10, 3, 20), datetime(2026, 10, 3, 23, 30))
+    response = client.get('/shows/calendar?month=2026-10')
+    assert response.status_code == 200
+    assert b'2 shows' in response.data
@@ -0,0 +1,58 @@
+from sqlalchemy.dialects import postgresql
+
+import search
+from models import db, Venue
+
+
+def add_venues(*rows):
+    venues = [Venue(name=name, city=city, state=state, genres=['Jazz']) for name, city, state in rows]
+    db.session.add_all(venues)
+    db.session.commit()
+    return venues
+
+
+def names(term, **kwargs):
+    total, venues = search.search(db.session, Venue, term, **kwargs)
+    return total, sorted(venue.name for venue in venues)
+
+
+def test_inverted_index_search(app):
+    add_venues(('The Musical Hop', 'San Francisco', 'CA'),
+               ('The Dueling Pianos Bar', 'New York', 'NY'),
+               ('Park Square Live Music & Coffee', 'San Francisco', 'CA'))
+
+    assert names('music') == (2, ['Park Square Live Music & Coffee', 'The Musical Hop'])
+    assert names('sical h') == (1, ['The Musical Hop'])
+    assert names('new york') == (1, ['The Dueling Pianos Bar'])
+    assert names('ny') == (1, ['The Dueling Pianos Bar'])
+    assert names('op') == (1, ['The Musical Hop'])
+    assert names('jazz') == (0, [])
+
+
+def test_inverted_index_follows_commits(app):
+    hop, = add_venues(('The Musical Hop', 'San Francisco', 'CA'))
+    assert names('hop') == (1, ['The Musical Hop'])
+
+    hop.name = 'The Musical Stop'
+    db.session.commit()
+    assert names('hop') == (0, [])
+    assert names('stop') == (1, ['The Musical Stop'])
+
+
+def test_count_is_bounded(app):
+    add_venues(*((f'Venue {i}', 'San Francisco', 'CA') for i in range(5)))
+    total, venues = search.search(db.session, Venue, 'venue', per_page=2, max_count=3)
+    assert (total, len(venues)) == (4, 2)
+    assert search.count_label(total, 3) == '3+'
+
+
+def test_search_page(client):
+    add_venues(('The Musical Hop', 'San Francisco', 'CA'))
+    response = client.post('/venues/search', data={'search_term': 'musical'})
+    assert b'The Musical Hop' in response.data
+
+
+def test_postgres_ranks_by_trigram_distance():
+    # ORDER BY name <-> term is what the GiST trigram index returns in order
+    order = search.ranking(Venue, 'hop', 'postgresql')[0]
+    assert str(order.compile(dialect=postgresql.dialect())) == 'venue.name <-> %(name_1)s'
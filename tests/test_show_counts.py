@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import show_counts
+from models import db, Venue, Artist, Show
+
+
+def add_pair():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock_n_Roll'])
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    return venue, artist
+
+
+def counts(entity):
+    db.session.refresh(entity)
+    return entity.upcoming_show_count, entity.past_show_count
+
+
+def test_triggers_recount_venues_and_artists(app):
+    venue, artist = add_pair()
+    now = datetime.now()
+    show = Show(venue=venue, artist=artist, start_time=now + timedelta(days=1))
+    db.session.add_all([show, Show(venue=venue, artist=artist, start_time=now - timedelta(days=1))])
+    db.session.commit()
+    assert counts(venue) == counts(artist) == (1, 1)
+
+    show.start_time = now - timedelta(days=2)
+    db.session.commit()
+    assert counts(venue) == counts(artist) == (0, 2)
+
+    other, _ = add_pair()
+    show.venue = other
+    db.session.commit()
+    assert counts(venue) == (0, 1)
+    assert counts(other) == (0, 1)
+
+    db.session.delete(show)
+    db.session.commit()
+    assert counts(other) == (0, 0)
+    assert counts(artist) == (0, 1)
+
+
+def test_deleting_a_show_that_started_since_the_last_refresh(app):
+    venue, artist = add_pair()
+    show = Show(venue=venue, artist=artist, start_time=datetime.now() + timedelta(seconds=1))
+    db.session.add(show)
+    db.session.commit()
+    assert counts(venue) == (1, 0)
+
+    # Started, refresh-show-counts has not run: still counted as upcoming
+    db.session.execute(db.update(Show).values(start_time=datetime.now() - timedelta(minutes=1))
+                       .execution_options(synchronize_session=False))
+    db.session.execute(db.update(Venue).values(upcoming_show_count=1, past_show_count=0))
+    db.session.commit()
+
+    db.session.delete(show)
+    db.session.commit()
+    assert counts(venue) == (0, 0)
+
+
+def test_refresh_moves_started_shows_to_the_past(app):
+    venue, artist = add_pair()
+    db.session.add(Show(venue=venue, artist=artist, start_time=datetime.now() + timedelta(days=1)))
+    db.session.commit()
+    # The show starts: its venue still counts it as upcoming
+    db.session.execute(db.update(Show).values(start_time=datetime.now() - timedelta(minutes=5))
+                       .execution_options(synchronize_session=False))
+    db.session.execute(db.update(Venue).values(upcoming_show_count=1, past_show_count=0))
+    db.session.commit()
+
+    assert show_counts.refresh(db.session, timedelta(minutes=60)) >= 1
+    assert counts(venue) == (0, 1)
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import summaries
+from models import db, Venue, Artist, Show, VenueSummary
+
+
+def add_venue_with_shows(*days):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock_n_Roll'])
+    now = datetime.now()
+    db.session.add_all([venue, artist] + [Show(venue=venue, artist=artist, start_time=now + timedelta(days=day))
+                                          for day in days])
+    db.session.commit()
+    return venue.id
+
+
+def test_detail_page_counts_match_its_lists(client):
+    venue_id = add_venue_with_shows(1, 2, -1)
+    response = client.get(f'/venues/{venue_id}')
+    assert b'2 Upcoming Shows' in response.data
+    assert b'1 Past Show<' in response.data
+
+
+def test_shows_that_started_since_the_refresh_move_with_their_counts(app):
+    venue_id = add_venue_with_shows(1, 2, -1)
+    summary = db.session.get(VenueSummary, venue_id)
+    assert (summary.upcoming_show_count, summary.past_show_count) == (2, 1)
+
+    shows = summaries.page_shows(db.session, Venue, venue_id, summary, 10, datetime.now() + timedelta(days=1, hours=1))
+    assert len(shows['upcoming_shows']) == shows['upcoming_shows_count'] == 1
+    assert len(shows['past_shows']) == shows['past_shows_count'] == 2
+
+
+def test_counts_beyond_the_listed_shows(app):
+    venue_id = add_venue_with_shows(1, 2, 3, -1)
+    with db.engine.begin() as connection:
+        summaries.refresh(connection, Venue, [venue_id], limit=1)
+    summary = db.session.get(VenueSummary, venue_id)
+    assert (summary.upcoming_show_count, summary.past_show_count) == (3, 1)
+
+    # Every listed upcoming show has started: the unlisted ones are counted again
+    shows = summaries.page_shows(db.session, Venue, venue_id, summary, 1, datetime.now() + timedelta(days=2, hours=1))
+    assert (shows['upcoming_shows_count'], shows['past_shows_count']) == (1, 3)
+    assert len(shows['upcoming_shows']) == len(shows['past_shows']) == 1
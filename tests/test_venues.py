@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from models import db, Venue, Artist, Show
+
+
+def add_venues(count, shows_each=2):
+    """ count venues spread over three cities, each with past and upcoming shows. """
+    now = datetime.now()
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock_n_Roll'])
+    db.session.add(artist)
+    for i in range(count):
+        venue = Venue(name=f'Venue {i}', city=f'City {i % 3}', state='NY', genres=['Jazz'])
+        db.session.add(venue)
+        for days in range(-shows_each, shows_each):
+            db.session.add(Show(venue=venue, artist=artist, start_time=now + timedelta(days=days, hours=1)))
+    db.session.commit()
+
+
+def venues_page_queries(client, queries, url='/venues'):
+    queries.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert b'Unable to query venues' not in response.data
+    return len(queries)
+
+
+def test_venues_page_query_count_does_not_grow_with_venues(client, queries):
+    add_venues(5)
+    few = venues_page_queries(client, queries)
+    add_venues(20, shows_each=5)
+    many = venues_page_queries(client, queries)
+
+    assert few == many
+    # The listing and the facet counts
+    assert many <= 2
+
+
+def test_filtered_venues_page_query_count_does_not_grow_with_venues(client, queries):
+    add_venues(5)
+    few = venues_page_queries(client, queries, '/venues?genre=Jazz&state=NY')
+    add_venues(20)
+    assert venues_page_queries(client, queries, '/venues?genre=Jazz&state=NY') == few
+
+
+def test_venues_page_lists_every_venue_by_area(client):
+    add_venues(6)
+    page = client.get('/venues').get_data(as_text=True)
+    for i in range(3):
+        assert f'City {i}, NY' in page
+    for i in range(6):
+        assert f'Venue {i}<' in page